@@ -0,0 +1,53 @@
+# Latency of small proofs checked with check_proof_async while a pathological
+# submission (a tableau with 2**11 branches) is being checked too: alone, next
+# to the pathological proof without a timeout, and next to it with a timeout.
+# Run from the repository root: python benchmarks/bench_async.py
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import AsyncProofChecker
+from tableaux import splits
+
+small = '1. T A pre\n2. F A conclusion\n3. @ 1,2\n'
+pathological = splits(11)
+
+async def timed(checker, proof, timeout=None):
+    start = time.perf_counter()
+    try:
+        await checker.check(proof, timeout=timeout)
+        status = 'done'
+    except TimeoutError:
+        status = 'timeout'
+    return status, time.perf_counter() - start
+
+async def scenario(with_pathological, timeout=None):
+    checker = AsyncProofChecker(max_workers=2, max_pending=256)
+    await checker.check(small)  # starts a worker outside the measurement
+    jobs = []
+    if with_pathological:
+        jobs.append(timed(checker, pathological, timeout))
+        await asyncio.sleep(0)
+    jobs += [timed(checker, small) for _ in range(200)]
+    results = await asyncio.gather(*jobs)
+    checker.close()
+    latencies = sorted(t for status, t in results[1 if with_pathological else 0:])
+    line = 'small p50 {:7.1f} ms  p99 {:7.1f} ms'.format(latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000)
+    if with_pathological:
+        status, t = results[0]
+        line += '   pathological {} after {:6.0f} ms'.format(status, t * 1000)
+    return line
+
+async def main():
+    print('alone                      ', await scenario(False))
+    print('with pathological          ', await scenario(True))
+    print('with pathological, 0.5 s   ', await scenario(True, timeout=0.5))
+    checker = AsyncProofChecker(max_workers=1, max_pending=10)
+    results = await asyncio.gather(*[checker.check(small) for _ in range(20)], return_exceptions=True)
+    checker.close()
+    print('max_pending=10, 20 at once  rejected {}'.format(sum(isinstance(r, asyncio.QueueFull) for r in results)))
+
+asyncio.run(main())
@@ -0,0 +1,41 @@
+# Checks a batch of submissions one at a time with check_proof and with
+# check_proofs on 1, 2, 4, ... worker processes (up to the number of cores).
+# Run from the repository root: python benchmarks/bench_check_proofs.py [N]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import check_proof, check_proofs
+
+here = os.path.join(os.path.dirname(__file__), '..', 'src', 'anita')
+with open(os.path.join(here, 'example_anita_en.txt')) as f:
+    example = f.read()
+submissions = [
+    (example, 'A|B, A->C, B->C |- C'),
+    (example, 'A|B |- C'),
+    ('1. T A|B pre\n2. F A conclusion\n3. {T A 1\n4. @ 3,2\n}\n5. {T B 1\n}\n', None),
+    ('1. T Ax P(x) pre\n2. F P(a) conclusion\n3. T P(a) 1\n4. @ 2,3\n', None),
+    ('1. T A pre\n2. F B conclusion\n3. @ 1,2\n', None),
+    ('1. T A & pre\n', None),
+]
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    batch = [submissions[i % len(submissions)] for i in range(n)]
+
+    start = time.perf_counter()
+    expected = [check_proof(proof, theorem) for proof, theorem in batch]
+    serial = time.perf_counter() - start
+    print('check_proof loop       {:8.0f} ms'.format(serial * 1000))
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        results = list(check_proofs(batch, max_workers=workers, chunksize=64))
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        print('check_proofs {:>2} workers {:8.0f} ms   speedup {:4.1f}x'.format(
+            workers, elapsed * 1000, serial / elapsed))
+        workers *= 2
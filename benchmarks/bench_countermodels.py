@@ -0,0 +1,29 @@
+# Share of the time of check_proof spent completing and verifying the
+# countermodels (verified_counter_examples), on tableaux with 2**n saturated
+# branches over 2n atoms.
+# Run from the repository root: python benchmarks/bench_countermodels.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import ParserAnita, check_proof, check_proof_result
+from tableaux import splits
+
+def verification(text):
+    result = check_proof_result(text)
+    result.deduction_result.counter_examples
+    start = timeit.default_timer()
+    verified = result.verified_countermodels
+    assert all(verified)
+    return timeit.default_timer() - start
+
+ParserAnita.get_parser()  # builds the parser outside the measurement
+for n in (1, 4, 7, 10):
+    text = splits(n)
+    runs = 5
+    t_check = min(timeit.repeat(lambda: check_proof(text), number=runs, repeat=3)) / runs
+    t_verify = min(verification(text) for _ in range(runs))
+    print('{:5} branches  check_proof {:9.2f} ms   verification {:7.3f} ms ({:4.1f}%)'.format(
+        2 ** n, t_check * 1000, t_verify * 1000, 100 * t_verify / t_check))
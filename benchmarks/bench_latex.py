@@ -0,0 +1,101 @@
+# Renders the LaTeX of tableaux of about 1,000 nodes, plain and with every
+# rule of the open branches highlighted, with SymbolTable.toLatex and with the
+# renderer it replaced (kept below), which concatenated strings recursively
+# and looked up each rule in the list of highlighted rules. Both must give
+# the same bytes.
+# Run from the repository root: python benchmarks/bench_latex.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import (AndTrueRule, ConclusionRule, ImpFalseRule, OrFalseRule,
+                               ParserAnita, PremisseRule)
+from tableaux import conjunctions, splits
+
+def concatenating_branch_to_latex(table, branch, rules=[], color='red'):
+  i = 0
+  l = []
+  initial_tableau = '[.{'
+  n_rules = len(branch.rules) 
+  while i< n_rules:
+    if isinstance(branch.rules[i],PremisseRule):
+      if (branch.rules[i] in rules):
+        initial_tableau += '\color{'+color+'}{$'+branch.rules[i].toLatex(table)+'$} \\\\ '
+      else:
+        initial_tableau += '$'+branch.rules[i].toLatex(table)+'$ \\\\ '
+    elif isinstance(branch.rules[i],ConclusionRule):
+      if (branch.rules[i] in rules):
+        initial_tableau += '\color{'+color+'}{$'+branch.rules[i].toLatex(table)+'$}}'
+      else:
+        initial_tableau += '$'+branch.rules[i].toLatex(table)+'$}'
+      l.append(initial_tableau)
+    elif isinstance(branch.rules[i],AndTrueRule):
+      if (branch.rules[i] in rules):
+        s = '[.{{\color{'+color+'}$'+branch.rules[i].toLatex(table)+'$}'
+      else:
+        s = '[.{$'+branch.rules[i].toLatex(table)+'$'
+      if i+1< n_rules and isinstance(branch.rules[i+1],AndTrueRule) and branch.rules[i].reference1==branch.rules[i+1].reference1:            
+        if (branch.rules[i+1] in rules):
+          s+=' \\\\ {\color{'+color+'}$'+branch.rules[i+1].toLatex(table)+'$}'
+        else:  
+          s+=' \\\\ '+'$'+branch.rules[i+1].toLatex(table)+'$'
+        i+=1
+      l.append(s+'}')
+    elif isinstance(branch.rules[i],OrFalseRule):
+      if (branch.rules[i] in rules):
+        s = '[.{{\color{'+color+'}$'+branch.rules[i].toLatex(table)+'$}'
+      else:
+        s = '[.{$'+branch.rules[i].toLatex(table)+'$'
+      if i+1< n_rules and isinstance(branch.rules[i+1],OrFalseRule) and branch.rules[i].reference1==branch.rules[i+1].reference1:            
+        if (branch.rules[i+1] in rules):
+          s+=' \\\\ {\color{'+color+'}$'+branch.rules[i+1].toLatex(table)+'$}'
+        else:  
+          s+=' \\\\ '+'$'+branch.rules[i+1].toLatex(table)+'$'
+        i+=1
+      l.append(s+'}')
+    elif isinstance(branch.rules[i],ImpFalseRule):
+      if (branch.rules[i] in rules):
+        s = '[.{{\color{'+color+'}$'+branch.rules[i].toLatex(table)+'$}'
+      else:
+        s = '[.{$'+branch.rules[i].toLatex(table)+'$'
+      if i+1< n_rules and isinstance(branch.rules[i+1],ImpFalseRule) and branch.rules[i].reference1==branch.rules[i+1].reference1:            
+        if (branch.rules[i+1] in rules):
+          s+=' \\\\ {\color{'+color+'}$'+branch.rules[i+1].toLatex(table)+'$}'
+        else:  
+          s+=' \\\\ '+'$'+branch.rules[i+1].toLatex(table)+'$'
+        i+=1
+      l.append(s+'}')
+    else:
+      if (branch.rules[i] in rules):
+        l.append('[.{\color{'+color+'}{$'+branch.rules[i].toLatex(table)+'$}}') 
+
+      else:
+        l.append('[.{$'+branch.rules[i].toLatex(table)+'$}') 
+    i+=1
+  s = ' '.join(l)
+  for s_children in branch.children:
+    s+= ' '+concatenating_branch_to_latex(table, s_children,rules=rules,color=color)
+  s += ''.join([' ]' for r in range(len(l))])
+  return s
+
+inputs = {
+    '1,000 nodes in one branch': conjunctions(333),
+    '1,032 nodes in 512 branches': splits(9),
+}
+for name, text in inputs.items():
+    result = ParserAnita.getProof(text)
+    table = result.symbol_table
+    rules = []
+    for branch in result.open_branches + result.saturared_branches:
+        rules = rules + branch
+    for label, highlighted in (('plain', []), ('highlighted', rules)):
+        new = table.toLatex(rules=highlighted)
+        old = '\\Tree ' + concatenating_branch_to_latex(table, table.root, highlighted)
+        assert new == old
+        n = 5
+        t_old = min(timeit.repeat(lambda: concatenating_branch_to_latex(table, table.root, highlighted), number=n, repeat=3)) / n
+        t_new = min(timeit.repeat(lambda: table.toLatex(rules=highlighted), number=n, repeat=3)) / n
+        print('{:<28} {:<12} before {:8.2f} ms   toLatex {:8.2f} ms   speedup {:5.1f}x'.format(
+            name, label, t_old * 1000, t_new * 1000, t_old / t_new))
@@ -0,0 +1,38 @@
+# Time of a validity-only check (getProof and is_closed) against a check that
+# also reads every artefact the program production used to compute eagerly:
+# the LaTeX, the colored LaTeX, the theorem, the countermodels and the open
+# and saturated branches.
+# Run from the repository root: python benchmarks/bench_lazy.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import ParserAnita
+from tableaux import conjunctions, splits
+
+here = os.path.join(os.path.dirname(__file__), '..', 'src', 'anita')
+with open(os.path.join(here, 'example_anita_en.txt')) as f:
+    example = f.read()
+inputs = {
+    'example_anita_en.txt': example,
+    '150 conjunctions': conjunctions(150),
+    '2**7 branches': splits(7),
+}
+
+def validity(text):
+    return ParserAnita.getProof(text).is_closed
+
+def everything(text):
+    result = ParserAnita.getProof(text)
+    return (result.is_closed, result.latex, result.colored_latex, result.theorem, result.latex_theorem,
+            result.counter_examples, result.saturared_branches, result.open_branches)
+
+ParserAnita.getProof(example)  # builds the parser outside the measurement
+for name, text in inputs.items():
+    n = 5
+    t_all = min(timeit.repeat(lambda: everything(text), number=n, repeat=5)) / n
+    t_valid = min(timeit.repeat(lambda: validity(text), number=n, repeat=5)) / n
+    print('{:<22} all artefacts {:8.2f} ms   validity only {:8.2f} ms   speedup {:4.1f}x'.format(
+        name, t_all * 1000, t_valid * 1000, t_all / t_valid))
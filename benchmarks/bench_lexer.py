@@ -0,0 +1,33 @@
+# Compares the rply LexerGenerator backend with the single-pass lexer.
+# Run from the repository root: python benchmarks/bench_lexer.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import Lexer
+from anita.example_theorems import THEOREMS
+
+here = os.path.dirname(__file__)
+with open(os.path.join(here, '..', 'src', 'anita', 'example_anita_en.txt')) as f:
+    example = f.read()
+inputs = {
+    'example_theorems.THEOREMS': THEOREMS,
+    'example_anita_en.txt x 100': [example * 100],
+}
+
+rply_lexer = Lexer(single_pass=False).get_lexer()
+single_pass_lexer = Lexer().get_lexer()
+
+def lex_all(lexer, texts):
+    for text in texts:
+        for token in lexer.lex(text):
+            pass
+
+for name, texts in inputs.items():
+    n = 20
+    t_rply = min(timeit.repeat(lambda: lex_all(rply_lexer, texts), number=n, repeat=5)) / n
+    t_single = min(timeit.repeat(lambda: lex_all(single_pass_lexer, texts), number=n, repeat=5)) / n
+    print('{:<28} rply {:8.3f} ms   single-pass {:8.3f} ms   speedup {:5.1f}x'.format(
+        name, t_rply * 1000, t_single * 1000, t_rply / t_single))
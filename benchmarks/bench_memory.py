@@ -0,0 +1,28 @@
+# Memory used to check a proof of 499 lines: the peak while checking it and what
+# stays allocated afterwards (the result keeps the rules of the open branches,
+# with their formulas and tokens).
+# Run from the repository root: python benchmarks/bench_memory.py
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import ParserAnita
+from tableaux import conjunctions
+
+text = conjunctions(166)
+ParserAnita.getProof(text)  # builds the parser outside the measurement
+
+gc.collect()
+tracemalloc.start()
+result = ParserAnita.getProof(text)
+gc.collect()
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print('proof lines      {:8d}'.format(text.count('\n')))
+print('errors           {:8d}'.format(len(result.errors)))
+print('peak             {:8.1f} KiB'.format(peak / 1024))
+print('kept by result   {:8.1f} KiB'.format(current / 1024))
@@ -0,0 +1,34 @@
+# Proves every theorem of example_theorems.THEOREMS, propositional and first-order,
+# checks each proof with check_proof_result and prints the time of each search.
+# Run from the repository root: python benchmarks/bench_prover.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import check_proof_result, ProofStatus
+from anita.anita_prover import prove, SearchStatus
+from anita.example_theorems import THEOREMS
+
+prove(THEOREMS[0])  # builds the parsers outside the measurement
+total = 0
+proved = 0
+for theorem in THEOREMS:
+    start = time.perf_counter()
+    result = prove(theorem)
+    elapsed = time.perf_counter() - start
+    if result.status in (SearchStatus.ERROR, SearchStatus.NOT_FOUND):
+        print('{:<45} {:<12} {}'.format(theorem.strip(), result.status.value, result.message))
+        continue
+    check = check_proof_result(result.proof, theorem)
+    expected = ProofStatus.VALID if result.status == SearchStatus.PROVED else ProofStatus.NOT_VALID
+    assert check.status == expected, (theorem, check.status)
+    if result.status == SearchStatus.COUNTERMODEL:
+        assert len(check.countermodels) == len(result.countermodels), theorem
+        assert all(v in check.countermodels for v in result.countermodels), theorem
+    total += elapsed
+    proved += result.status == SearchStatus.PROVED
+    print('{:<45} {:<12} {:3} lines {:2} instances {:7.2f} ms'.format(theorem.strip(), result.status.value,
+        result.statistics['lines'], result.statistics['instances'], elapsed * 1000))
+print('{} theorems proved in {:.1f} ms'.format(proved, total * 1000))
@@ -0,0 +1,46 @@
+# Time of check_validity (Tseitin encoding and the CDCL solver) against the
+# tableau prover on theorems whose premisses are random 3-clauses over n atoms
+# (4.26 clauses per atom, where about half of them are satisfiable) and whose
+# conclusion is an atom that does not occur in them: the theorem is valid when
+# the premisses are unsatisfiable. The tableau is only built for n <= 4, and
+# the prover gives up after 100000 lines.
+# Run from the repository root: python benchmarks/bench_sat.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_prover import prove, SearchStatus
+from anita.anita_sat import check_validity
+
+def random_theorem(n, rng):
+    clauses = []
+    for _ in range(int(4.26 * n)):
+        clauses.append('|'.join(rng.choice(['', '~']) + 'A{}'.format(i) for i in rng.sample(range(n), 3)))
+    return ', '.join(clauses) + ' |- Z'
+
+rng = random.Random(0)
+check_validity(random_theorem(3, rng))  # builds the parser outside the measurement
+for n in (3, 4, 10, 20, 40, 80):
+    t_sat = t_tableau = 0
+    valid = gave_up = 0
+    for _ in range(5):
+        theorem = random_theorem(n, rng)
+        start = time.perf_counter()
+        result = check_validity(theorem)
+        t_sat += time.perf_counter() - start
+        valid += result.valid
+        if n <= 4:
+            start = time.perf_counter()
+            proof = prove(theorem, max_lines=10**5)
+            t_tableau += time.perf_counter() - start
+            if proof.status == SearchStatus.NOT_FOUND:
+                gave_up += 1
+            else:
+                assert (proof.status == SearchStatus.PROVED) == result.valid, theorem
+    line = '{:3} atoms  {} of 5 valid   sat {:9.2f} ms'.format(n, valid, t_sat / 5 * 1000)
+    if n <= 4:
+        line += '   tableau {:9.2f} ms ({} of 5 over 100000 lines)'.format(t_tableau / 5 * 1000, gave_up)
+    print(line)
@@ -0,0 +1,58 @@
+# Checks the same proofs from many threads at once and compares every answer
+# with the one computed serially: valid, invalid and incomplete tableaux, proofs
+# with errors and proofs with syntax errors, in English and in Portuguese.
+# Run from the repository root: python benchmarks/bench_threads.py
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import check_proof as check_en
+from anita.anita_pt_fo import check_proof as check_pt
+
+here = os.path.join(os.path.dirname(__file__), '..', 'src', 'anita')
+with open(os.path.join(here, 'example_anita_en.txt')) as f:
+    example_en = f.read()
+with open(os.path.join(here, 'example_anita_pt.txt')) as f:
+    example_pt = f.read()
+
+proofs_en = [
+    (example_en, None),
+    (example_en, 'A|B, A->C, B->C |- C'),
+    (example_en, 'A|B |- C'),
+    ('1. T A|B pre\n2. F A conclusion\n3. {T A 1\n4. @ 3,2\n}\n5. {T B 1\n}\n', None),
+    ('1. T A pre\n2. F A&B conclusion\n3. {F A 2\n4. @ 1,3\n}\n5. {F B 2\n}\n', None),
+    ('1. T Ax P(x) pre\n2. F P(a) conclusion\n3. T P(a) 1\n4. @ 2,3\n', None),
+    ('1. T Ex P(x) pre\n2. F P(a) conclusion\n3. T P(a) 1\n4. @ 2,3\n', None),
+    ('1. T A&B pre\n2. F A conclusion\n', None),
+    ('1. T A pre\n2. F B conclusion\n3. @ 1,2\n', None),
+    ('1. T A pre\n2. F A conclusion\n4. @ 1,2\n', None),
+    ('1. T A & pre\n', None),
+    ('', None),
+]
+proofs_pt = [
+    (example_pt, None),
+    ('1. T A pre\n2. F A conclusao\n3. @ 1,2\n', None),
+    ('1. T A pre\n2. F B conclusao\n3. @ 1,2\n', None),
+    ('1. T A & pre\n', None),
+]
+jobs = [(check_en, p, t) for p, t in proofs_en] + [(check_pt, p, t) for p, t in proofs_pt]
+
+def run(job):
+    check, proof, theorem = job
+    return check(proof, theorem)
+
+expected = [run(job) for job in jobs]
+
+repeat = 50
+for workers in (1, 4, 16):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, jobs * repeat))
+    elapsed = time.perf_counter() - start
+    mismatches = sum(1 for i, r in enumerate(results) if r != expected[i % len(jobs)])
+    print('{:>2} threads  {:5d} checks  {:8.1f} ms  mismatches {}'.format(
+        workers, len(results), elapsed * 1000, mismatches))
+    assert mismatches == 0
@@ -0,0 +1,68 @@
+# Time of truth_table (one big-integer operation per connective for all rows)
+# against a recursive evaluation of the premisses and the conclusion for each
+# row, on random theorems with n atoms and about 4n connectives. The row by row
+# evaluation is only run for n <= 16; both count the same countermodels.
+# Run from the repository root: python benchmarks/bench_truth_table.py
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anita.anita_en_fo import (AndFormula, BiImplicationFormula, ImplicationFormula, NegationFormula,
+                               OrFormula, ParserTheorem)
+from anita.anita_truth_table import truth_table
+
+def random_formula(atoms, size, rng):
+    if size == 0:
+        return rng.choice(atoms)
+    if rng.random() < 0.15:
+        return '~' + random_formula(atoms, size - 1, rng)
+    left = rng.randint(0, size - 1)
+    return '({}{}{})'.format(random_formula(atoms, left, rng), rng.choice(['&', '|', '->', '<->']),
+                             random_formula(atoms, size - 1 - left, rng))
+
+def random_theorem(n, rng):
+    atoms = ['A{}'.format(i) for i in range(n)]
+    premisses = [random_formula(atoms, n, rng) for _ in range(2)]
+    return ', '.join(premisses) + ' |- ' + random_formula(atoms, 2 * n, rng)
+
+def evaluate(formula, v):
+    if isinstance(formula, NegationFormula):
+        return not evaluate(formula.formula, v)
+    if isinstance(formula, AndFormula):
+        return evaluate(formula.left, v) and evaluate(formula.right, v)
+    if isinstance(formula, OrFormula):
+        return evaluate(formula.left, v) or evaluate(formula.right, v)
+    if isinstance(formula, ImplicationFormula):
+        return not evaluate(formula.left, v) or evaluate(formula.right, v)
+    if isinstance(formula, BiImplicationFormula):
+        return evaluate(formula.left, v) == evaluate(formula.right, v)
+    return v[formula.toString()]
+
+def count_countermodels(theorem, atoms):
+    premisses, conclusion = ParserTheorem.getTheorem(theorem)
+    count = 0
+    for values in itertools.product((False, True), repeat=len(atoms)):
+        v = dict(zip(atoms, values))
+        if all(evaluate(p, v) for p in premisses) and not evaluate(conclusion, v):
+            count += 1
+    return count
+
+rng = random.Random(0)
+truth_table(random_theorem(3, rng))  # builds the parser outside the measurement
+for n in (8, 12, 16, 20, 25):
+    theorem = random_theorem(n, rng)
+    start = time.perf_counter()
+    result = truth_table(theorem)
+    count = result.count_countermodels()
+    t_table = time.perf_counter() - start
+    line = '{:2} atoms  {:9} countermodels   bit-parallel {:9.2f} ms'.format(len(result.atoms), count, t_table * 1000)
+    if n <= 16:
+        start = time.perf_counter()
+        assert count_countermodels(theorem, result.atoms) == count, theorem
+        t_rows = time.perf_counter() - start
+        line += '   row by row {:9.2f} ms   speedup {:6.0f}x'.format(t_rows * 1000, t_rows / t_table)
+    print(line)
@@ -0,0 +1,31 @@
+# Tableaux of any size for the benchmarks, written in the syntax of the English
+# checker: from benchmarks/bench_*.py, import them with from tableaux import ...
+
+def conjunctions(n):
+    # n conjunctions, each expanded by two &T rules: an open tableau with one
+    # branch of 3n + 1 lines.
+    lines = ['{}. T (P{i}|Q{i})&(R{i}->S{i}) pre'.format(i + 1, i=i) for i in range(n)]
+    lines.append('{}. F Z conclusion'.format(n + 1))
+    k = n + 1
+    for i in range(n):
+        lines.append('{}. T P{i}|Q{i} {}'.format(k + 1, i + 1, i=i))
+        lines.append('{}. T R{i}->S{i} {}'.format(k + 2, i + 1, i=i))
+        k += 2
+    return '\n'.join(lines) + '\n'
+
+def splits(n):
+    # n nested splits of n disjunctive premises: 2**n saturated branches over 2n
+    # atoms, with 2**(n+1) - 2 + n + 1 nodes.
+    lines = ['{}. T A{i}|B{i} pre'.format(i + 1, i=i) for i in range(n)]
+    lines.append('{}. F C conclusion'.format(n + 1))
+    k = [n + 1]
+    def split(i):
+        if i == n:
+            return
+        for atom in ('A', 'B'):
+            k[0] += 1
+            lines.append('{}. {{ T {}{} {}'.format(k[0], atom, i, i + 1))
+            split(i + 1)
+            lines.append('}')
+    split(0)
+    return '\n'.join(lines) + '\n'
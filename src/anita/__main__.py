@@ -1,41 +1,191 @@
 import argparse
-from anita.anita_pt_fo import check_proof as check_pt
-from anita.anita_en_fo import check_proof as check_en
+import glob
+import json
 import os
+import sys
 
-def main():
-    parser = argparse.ArgumentParser(description='Analytic Tableau Proof Assistant (ANITA).')
-    parser.add_argument("-i", type=str, required=True, help="Arquivo de entrada com a prova em ANITA.")
+def expand_inputs(inputs):
+    # Files named by -i, in order. A directory stands for the files in it and a
+    # glob for the files it matches; either one (or more than one -i) selects
+    # the batch mode.
+    files = []
+    batch = len(inputs) > 1
+    for name in inputs:
+        if os.path.isdir(name):
+            batch = True
+            files.extend(sorted(os.path.join(name, f) for f in os.listdir(name) if os.path.isfile(os.path.join(name, f))))
+        elif not os.path.exists(name) and glob.has_magic(name):
+            batch = True
+            files.extend(sorted(f for f in glob.glob(name, recursive=True) if os.path.isfile(f)))
+        else:
+            files.append(name)
+    return files, batch
+
+def read_manifest(fileName):
+    # JSON object mapping each input file (as given to -i, or just its name) to
+    # the theorem it must prove.
+    with open(fileName, 'r', encoding='utf8') as f:
+        return json.load(f)
+
+def check_batch(files, theorems, input_lang, workers, output, display_latex, display_theorem, display_countermodel):
+    if input_lang=="pt":
+        from anita.anita_pt_fo import ProofError, check_proof_result, check_proofs
+    else:
+        from anita.anita_en_fo import ProofError, check_proof_result, check_proofs
+    records = []
+    proofs = []
+    for fileName in files:
+        if isinstance(theorems, dict):
+            input_theorem = theorems.get(fileName, theorems.get(os.path.basename(fileName)))
+        else:
+            input_theorem = theorems
+        record = {'file': fileName, 'theorem': input_theorem}
+        try:
+            with open(fileName, 'r', encoding='utf8') as f:
+                proofs.append((f.read(), input_theorem))
+        except (OSError, UnicodeDecodeError) as e:
+            record['error'] = str(e)
+        records.append(record)
+
+    display = dict(display_latex=display_latex, display_theorem=display_theorem, display_countermodel=display_countermodel)
+    def check(proof, theorem):
+        # As in check_proofs, a proof whose check raises gets a ProofError, so
+        # one bad file does not stop the batch.
+        try:
+            result = check_proof_result(proof, theorem)
+            return dict(result.to_dict(), text=result.to_text(**display))
+        except Exception as e:
+            return ProofError('{}: {}'.format(type(e).__name__, e))
+    if workers == 1:
+        results = (check(proof, theorem) for proof, theorem in proofs)
+    else:
+        results = check_proofs(proofs, max_workers=workers or None, as_dict=True, **display)
+    # One JSON object per line, written as soon as the result of its file is known:
+    # the status of the proof (as in ProofStatus) and its data, with the text
+    # check_proof prints under 'result'.
+    for record in records:
+        if 'error' not in record:
+            result = next(results)
+            if isinstance(result, ProofError):
+                record['error'] = str(result)
+            else:
+                record['status'] = result['status']
+                record['valid'] = result['status'] == 'valid'
+                record['proved_theorem'] = result['theorem']
+                for key in ('errors', 'countermodels', 'verified_countermodels', 'open_branches'):
+                    record[key] = result[key]
+                record['result'] = result['text']
+        output.write(json.dumps(record, ensure_ascii=False)+'\n')
+        output.flush()
+
+def add_display_arguments(parser):
     parser.add_argument("-l", type=str, default="pt", help="Digite pt para Português (default) ou en para Inglês.")
-    parser.add_argument("-t", type=str, help="Entre com o teorema a ser analisado.")
     parser.add_argument("-dl", type=int, default=0, help="Digite 1 para exibir o código LaTeX.")
     parser.add_argument("-dt", type=int, default=0, help="Digite 1 para exibir o teorema.")
     parser.add_argument("-dc", type=int, default=0, help="Digite 1 para exibir o contra-exemplo do teorema.")
+
+def add_server_arguments(parser):
+    from anita.anita_server import DEFAULT_HOST, DEFAULT_PORT
+    parser.add_argument("--socket", type=str, help="Socket Unix do servidor (por padrão, HTTP em --host e --port).")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Endereço HTTP do servidor (default: {}).".format(DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta HTTP do servidor (default: {}).".format(DEFAULT_PORT))
+
+def serve(argv):
+    parser = argparse.ArgumentParser(prog='anita serve', description='Servidor do ANITA: mantém os verificadores carregados e responde a requisições JSON.')
+    add_server_arguments(parser)
+    parser.add_argument("-j", type=int, default=1, help="Número de processos que verificam as provas (default: 1, no próprio servidor).")
+    args = parser.parse_args(argv)
+    from anita.anita_server import Checker, serve as serve_forever
+    try:
+        serve_forever(Checker(workers=args.j), socket_path=args.socket, host=args.host, port=args.port)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        return "Não foi possível iniciar o servidor do ANITA: {}".format(e)
+
+def client(argv):
+    # Same options and output as the one-shot command, but the proof is
+    # checked by a running "anita serve".
+    parser = argparse.ArgumentParser(prog='anita client', description='Analytic Tableau Proof Assistant (ANITA).')
+    parser.add_argument("-i", type=str, required=True, help="Arquivo de entrada com a prova em ANITA.")
+    parser.add_argument("-t", type=str, help="Entre com o teorema a ser analisado.")
+    add_display_arguments(parser)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.l not in ("pt", "en"):
+        print("Você deve escolher pt para Português (default) ou en para Inglês.")
+        return
+    if not os.path.isfile(args.i):
+        return "Arquivo não encontradao"
+    with open(args.i, 'r') as f:
+        input_proof = f.read()
+    from anita.anita_server import send
+    try:
+        response = send({'proof': input_proof, 'theorem': args.t, 'language': args.l,
+                         'display_latex': args.dl==1, 'display_theorem': args.dt==1, 'display_countermodel': args.dc==1},
+                        socket_path=args.socket, host=args.host, port=args.port)
+    except OSError as e:
+        return "Não foi possível falar com o servidor do ANITA: {}".format(e)
+    if 'error' in response:
+        return response['error']
+    print(response['result'])
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('serve', 'client'):
+        command = serve if sys.argv[1]=='serve' else client
+        return command(sys.argv[2:])
+    parser = argparse.ArgumentParser(description='Analytic Tableau Proof Assistant (ANITA). Use "anita serve" para iniciar um servidor e "anita client" para verificar uma prova nele.')
+    parser.add_argument("-i", type=str, nargs='+', required=True, help="Arquivo de entrada com a prova em ANITA. Vários arquivos, um diretório ou um padrão glob (ex.: 'provas/*.txt') verificam todos em lote.")
+    parser.add_argument("-t", type=str, help="Entre com o teorema a ser analisado. Em lote, pode ser um arquivo JSON que associa cada arquivo de entrada ao seu teorema.")
+    add_display_arguments(parser)
+    parser.add_argument("-j", type=int, default=1, help="Em lote, número de processos que verificam as provas (0 usa todos os núcleos).")
+    parser.add_argument("-o", type=str, help="Em lote, arquivo de saída com um resultado JSON por linha (default: saída padrão).")
     args = parser.parse_args()
     input_theorem = None
     input_lang = "pt"
     input_display_latex = False
     input_display_theorem = False
     input_display_countermodel = False
-    if args.i is not None: fileName = args.i
+    fileNames, batch = expand_inputs(args.i)
     if args.t is not None: input_theorem = args.t
     if args.l is not None: input_lang = args.l
     if args.dl is not None: input_display_latex = (args.dl==1)
     if args.dt is not None: input_display_theorem = (args.dt==1)
     if args.dc is not None: input_display_countermodel = (args.dc==1)
 
+    if input_lang not in ("pt", "en"):
+        print("Você deve escolher pt para Português (default) ou en para Inglês.")
+        return
+
+    if batch:
+        if not fileNames:
+            return "Nenhum arquivo encontrado em {}".format(', '.join(args.i))
+        if input_theorem is not None and os.path.isfile(input_theorem):
+            input_theorem = read_manifest(input_theorem)
+        output = sys.stdout if args.o is None else open(args.o, 'w', encoding='utf8')
+        try:
+            check_batch(fileNames, input_theorem, input_lang, args.j, output, input_display_latex, input_display_theorem, input_display_countermodel)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return
+
+    fileName = fileNames[0]
     if not os.path.isfile(fileName):
         return "Arquivo não encontradao"
     f = open(fileName, 'r')
 
     input_proof = f.read()
+    # Only the selected language is imported, so a one-shot run loads a single grammar.
     if input_lang=="pt":
+        from anita.anita_pt_fo import check_proof as check_pt
         print(check_pt(input_proof,input_theorem=input_theorem,display_latex=input_display_latex, display_theorem=input_display_theorem, display_countermodel=input_display_countermodel))
     elif input_lang=="en":
+        from anita.anita_en_fo import check_proof as check_en
         print(check_en(input_proof,input_theorem=input_theorem,display_latex=input_display_latex, display_theorem=input_display_theorem, display_countermodel=input_display_countermodel))
-    else:
-        print("Você deve escolher pt para Português (default) ou en para Inglês.")
-    
+
 
 if __name__ == '__main__':
-    main()
+    # As the anita console script does: a returned message is printed and
+    # ends the program with status 1.
+    sys.exit(main())
@@ -0,0 +1,374 @@
+# Builds analytic tableaux for theorems and writes them as ANITA proofs, which
+# ParserAnita.getProof accepts: a closed tableau when the theorem is valid, or a
+# tableau whose open branches are saturated, with their countermodels, when it
+# is not. Alpha rules are applied before beta rules, a branch is closed as soon
+# as it has a formula with both truth values (or T @), and among the beta
+# rules of a branch one with a child that closes at once is preferred. ANITA
+# has no rule that closes a branch on T @ alone, so such a branch ends with a
+# comment in the proof. The countermodels are verified against the theorem
+# before they are returned.
+# First-order theorems need the delta rules (AF and ET), applied once with a
+# fresh variable, and the gamma rules (AT and EF), applied again for each
+# variable of the branch. A gamma formula is instantiated at most max_terms
+# times in a branch, taking turns with the other gamma formulas so that none
+# of them is starved; the search is repeated with 1, 2, ..., max_terms
+# instances (iterative deepening) and gives up after max_lines lines.
+import enum
+import importlib
+import itertools
+import time
+
+MODULES = {
+    'en': 'anita.anita_en_fo',
+    'pt': 'anita.anita_pt_fo',
+}
+CONCLUSION = {
+    'en': 'conclusion',
+    'pt': 'conclusao',
+}
+
+class SearchStatus(enum.Enum):
+    PROVED = 'proved'                # closed tableau
+    COUNTERMODEL = 'countermodel'    # every open branch is saturated
+    NOT_FOUND = 'not_found'          # no closed tableau within max_terms and max_lines
+    ERROR = 'error'                  # the theorem is not well formed or not supported
+
+class SearchResult():
+    def __init__(self, theorem, status, proof=None, countermodels=None, message=None, statistics=None):
+        self.theorem = theorem
+        self.status = status
+        self.proof = proof
+        self.countermodels = countermodels or []
+        self.message = message
+        self.statistics = statistics or {}
+
+    def to_dict(self):
+        return {
+            'theorem': self.theorem,
+            'status': self.status.value,
+            'proof': self.proof,
+            'countermodels': self.countermodels,
+            'message': self.message,
+            'statistics': self.statistics,
+        }
+
+def opposite(sign):
+    return 'F' if sign == 'T' else 'T'
+
+class SearchLimit(Exception):
+    # Raised when a branch stays open because of max_terms, or the proof reaches
+    # max_lines: the attempt is abandoned.
+    def __init__(self, lines=False):
+        super().__init__()
+        self.lines = lines
+
+class TableauBranch():
+    # The signed formulas of a branch (with those of its ancestors): the line of
+    # each formula by truth value, the formulas still to be expanded, the first
+    # contradiction found, the free variables of the branch in order of
+    # appearance and every variable name of the branch, free or bound (names).
+    # Each gamma formula is kept as [line, sign, formula, tried,
+    # instances] with the variables already tried and the lines written for it;
+    # captured is set when a variable could not be tried because a quantifier of
+    # the formula would capture it, and then the branch is never saturated.
+    def __init__(self):
+        self.lines = {}
+        self.alphas = []
+        self.betas = []
+        self.deltas = []
+        self.gammas = []
+        self.closure = None
+        self.variables = {}
+        self.names = set()
+        self.captured = False
+
+    def copy(self):
+        branch = TableauBranch()
+        branch.lines = {formula: dict(signs) for formula, signs in self.lines.items()}
+        branch.alphas = list(self.alphas)
+        branch.betas = list(self.betas)
+        branch.deltas = list(self.deltas)
+        branch.gammas = [[line, sign, formula, set(tried), instances] for line, sign, formula, tried, instances in self.gammas]
+        branch.closure = self.closure
+        branch.variables = dict(self.variables)
+        branch.names = set(self.names)
+        branch.captured = self.captured
+        return branch
+
+    def add(self, prover, line, sign, formula):
+        signs = self.lines.setdefault(formula, {})
+        if self.closure is None and opposite(sign) in signs:
+            self.closure = (signs[opposite(sign)], line)
+        elif self.closure is None and sign == 'T' and prover.is_bottom(formula):
+            self.closure = (line, None)
+        signs.setdefault(sign, line)
+        for variable in sorted(formula.free_variables()):
+            self.variables.setdefault(variable, len(self.variables))
+        self.names |= formula.all_variables()
+        kind = prover.expansion(sign, formula)[0]
+        if kind == 'alpha':
+            self.alphas.append((line, sign, formula))
+        elif kind == 'beta':
+            self.betas.append((line, sign, formula))
+        elif kind == 'delta':
+            self.deltas.append((line, sign, formula))
+        elif kind == 'gamma':
+            self.gammas.append([line, sign, formula, set(), 0])
+
+    def closes(self, sign, formula):
+        return opposite(sign) in self.lines.get(formula, ())
+
+    def has(self, sign, formula):
+        return sign in self.lines.get(formula, ())
+
+class ProofWriter():
+    def __init__(self):
+        self.lines = []
+        self.line = 0
+
+    def step(self, depth, sign, formula, justification, open_box=False):
+        self.line += 1
+        self.lines.append('{}. {}{}{} {} {}'.format(self.line, '  '*depth, '{ ' if open_box else '', sign, formula.toString(), justification))
+        return self.line
+
+    def close(self, depth, closure):
+        if closure[1] is None:
+            self.lines.append('{}# T @ in line {} closes the branch.'.format('  '*depth, closure[0]))
+            return
+        self.line += 1
+        self.lines.append('{}. {}@ {},{}'.format(self.line, '  '*depth, closure[0], closure[1]))
+
+    def end_box(self, depth):
+        self.lines.append('  '*depth + '}')
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+class TableauProver():
+    def __init__(self, language='en', max_terms=4, max_lines=5000):
+        self.language = language
+        self.module = importlib.import_module(MODULES[language])
+        self.max_terms = max_terms
+        self.max_lines = max_lines
+
+    def expansion(self, sign, formula):
+        # ('alpha', rule, [(sign, formula), ...]) with the formulas of one branch,
+        # ('beta', rule, [(sign, formula), (sign, formula)]) with the first formula
+        # of each branch, ('gamma', rule, []) and ('delta', rule, []) for the
+        # quantifiers (see instance), or (None, None, []) for atoms and predicates.
+        m = self.module
+        if isinstance(formula, m.QuantifierFormula):
+            if formula.forAll == (sign == 'T'):
+                return 'gamma', 'A'+sign if formula.forAll else 'E'+sign, []
+            return 'delta', 'A'+sign if formula.forAll else 'E'+sign, []
+        if isinstance(formula, m.NegationFormula):
+            return 'alpha', '~'+sign, [(opposite(sign), formula.formula)]
+        if isinstance(formula, m.AndFormula):
+            if sign == 'T':
+                return 'alpha', '&T', [('T', formula.left), ('T', formula.right)]
+            return 'beta', '&F', [('F', formula.left), ('F', formula.right)]
+        if isinstance(formula, m.OrFormula):
+            if sign == 'T':
+                return 'beta', '|T', [('T', formula.left), ('T', formula.right)]
+            return 'alpha', '|F', [('F', formula.left), ('F', formula.right)]
+        if isinstance(formula, m.ImplicationFormula):
+            if sign == 'T' and formula.left is formula.right:
+                # ANITA rejects the ->T branches of X->X, which is true anyway.
+                return None, None, []
+            if sign == 'T':
+                return 'beta', '->T', [('F', formula.left), ('T', formula.right)]
+            return 'alpha', '->F', [('T', formula.left), ('F', formula.right)]
+        return None, None, []
+
+    def instance(self, formula, variable):
+        # The formula of a quantifier with its variable replaced by the given one,
+        # or None when the variable would be captured by another quantifier.
+        result = formula.formula.substitution(formula.variable, variable)
+        if not formula.valid_substitution(result):
+            return None
+        return result
+
+    def fresh_instance(self, branch, formula):
+        # The first of x1, x2, ... (for the variable x of the formula) that does
+        # not occur in the branch, with the instance. A name bound somewhere in
+        # the branch would be captured by the gamma formulas that bind it, which
+        # then could never be instantiated with it.
+        for i in itertools.count(1):
+            variable = '{}{}'.format(formula.variable, i)
+            if variable not in branch.names:
+                result = self.instance(formula, variable)
+                if result is not None:
+                    return result
+
+    def is_literal(self, formula):
+        m = self.module
+        return not isinstance(formula, (m.NegationFormula, m.BinaryFormula, m.QuantifierFormula, m.BottonFormula))
+
+    def is_bottom(self, formula):
+        return isinstance(formula, self.module.BottonFormula)
+
+    def is_countermodel(self, v, premisses, conclusion):
+        # As SymbolTable.is_counter_example: None when the theorem is not
+        # propositional, and a first-order countermodel is not verified.
+        evaluations = [formula.evaluation() for formula in premisses + [conclusion]]
+        if None in evaluations:
+            return None
+        return all(evaluation(v) for evaluation in evaluations[:-1]) and not evaluations[-1](v)
+
+    def unsupported(self, formula):
+        # Formulas the rules of ANITA proofs cannot expand.
+        m = self.module
+        if isinstance(formula, m.BiImplicationFormula):
+            return 'The rules of ANITA have no bi-implication (<->).'
+        if isinstance(formula, m.NegationFormula) or isinstance(formula, m.QuantifierFormula):
+            return self.unsupported(formula.formula)
+        if isinstance(formula, m.BinaryFormula):
+            return self.unsupported(formula.left) or self.unsupported(formula.right)
+        return None
+
+    def prove(self, theorem):
+        start = time.perf_counter()
+        premisses, conclusion = self.module.ParserTheorem.getTheorem(theorem)
+        if conclusion is None:
+            return SearchResult(theorem, SearchStatus.ERROR, message='{} is not a valid theorem.'.format(theorem))
+        for formula in premisses + [conclusion]:
+            message = self.unsupported(formula)
+            if message is not None:
+                return SearchResult(theorem, SearchStatus.ERROR, message=message)
+
+        statistics = {'attempts': 0, 'lines': 0, 'branches': 0, 'instances': 0}
+        message = None
+        for bound in range(1, self.max_terms+1):
+            self.bound = bound
+            self.writer = ProofWriter()
+            self.branches = 0
+            self.instances = 0
+            self.bottom_closures = 0
+            statistics['attempts'] += 1
+            try:
+                countermodels = self.attempt(premisses, conclusion)
+            except SearchLimit as e:
+                countermodels = None
+                if e.lines:
+                    message = 'No proof was found within {} lines.'.format(self.max_lines)
+                    break
+            finally:
+                statistics['lines'] += self.writer.line
+                statistics['branches'] += self.branches
+                statistics['instances'] += self.instances
+            if countermodels is not None:
+                statistics['max_terms'] = bound
+                statistics['seconds'] = time.perf_counter() - start
+                if any(self.is_countermodel(v, premisses, conclusion) is False for v in countermodels):
+                    return SearchResult(theorem, SearchStatus.NOT_FOUND, message='A countermodel of the tableau is not a countermodel of the theorem.', statistics=statistics)
+                status = SearchStatus.PROVED if countermodels == [] else SearchStatus.COUNTERMODEL
+                if self.bottom_closures:
+                    message = 'ANITA has no rule that closes a branch on T @: the proof is not accepted by check_proof.'
+                return SearchResult(theorem, status, proof=self.writer.text(), countermodels=countermodels, message=message, statistics=statistics)
+        statistics['max_terms'] = self.bound
+        statistics['seconds'] = time.perf_counter() - start
+        if message is None:
+            message = 'No proof was found with {} instances of each gamma formula.'.format(self.bound)
+        return SearchResult(theorem, SearchStatus.NOT_FOUND, message=message, statistics=statistics)
+
+    def attempt(self, premisses, conclusion):
+        self.atoms = conclusion.atoms().union(*[p.atoms() for p in premisses])
+        branch = TableauBranch()
+        for formula in premisses:
+            branch.add(self, self.writer.step(0, 'T', formula, 'pre'), 'T', formula)
+        branch.add(self, self.writer.step(0, 'F', conclusion, CONCLUSION[self.language]), 'F', conclusion)
+        return self.expand(branch, 0)
+
+    def expand(self, branch, depth):
+        # Writes the rest of the branch and returns the countermodels of its
+        # saturated open branches ([] if every branch closes).
+        while True:
+            if self.writer.line >= self.max_lines:
+                raise SearchLimit(lines=True)
+            if branch.closure is not None:
+                self.writer.close(depth, branch.closure)
+                self.branches += 1
+                if branch.closure[1] is None:
+                    self.bottom_closures += 1
+                return []
+            if branch.alphas:
+                line, sign, formula = branch.alphas.pop(0)
+                kind, rule, results = self.expansion(sign, formula)
+                added = [(self.writer.step(depth, s, f, '{} {}'.format(rule, line)), s, f) for s, f in results]
+                for new_line, s, f in added:
+                    branch.add(self, new_line, s, f)
+                continue
+            if branch.deltas:
+                line, sign, formula = branch.deltas.pop(0)
+                rule = self.expansion(sign, formula)[1]
+                result = self.fresh_instance(branch, formula)
+                branch.add(self, self.writer.step(depth, sign, result, '{} {}'.format(rule, line)), sign, result)
+                continue
+            if branch.betas:
+                line, sign, formula = self.select_beta(branch)
+                kind, rule, results = self.expansion(sign, formula)
+                countermodels = []
+                for s, f in results:
+                    child = branch.copy()
+                    child.add(self, self.writer.step(depth, s, f, '{} {}'.format(rule, line), open_box=True), s, f)
+                    countermodels += self.expand(child, depth+1)
+                    self.writer.end_box(depth)
+                return countermodels
+            if self.instantiate(branch, depth):
+                continue
+            if branch.captured or any(not branch.variables.keys() <= tried for line, sign, formula, tried, instances in branch.gammas):
+                raise SearchLimit()
+            self.branches += 1
+            return [self.countermodel(branch)]
+
+    def instantiate(self, branch, depth):
+        # Applies a gamma rule with a variable of the branch the formula has not
+        # been instantiated with (the variable of the formula itself if the branch
+        # has none), choosing the formula with fewest instances. Returns False
+        # when no gamma formula has an instance left within the bound.
+        variables = sorted(branch.variables, key=branch.variables.get)
+        for gamma in sorted(branch.gammas, key=lambda gamma: gamma[4]):
+            line, sign, formula, tried, instances = gamma
+            if instances >= self.bound:
+                continue
+            for variable in variables or [formula.variable]:
+                if variable in tried:
+                    continue
+                tried.add(variable)
+                result = self.instance(formula, variable)
+                if result is None:
+                    branch.captured = True
+                    continue
+                if branch.has(sign, result):
+                    continue
+                gamma[4] += 1
+                rule = self.expansion(sign, formula)[1]
+                branch.add(self, self.writer.step(depth, sign, result, '{} {}'.format(rule, line)), sign, result)
+                self.instances += 1
+                return True
+        return False
+
+    def select_beta(self, branch):
+        for i, (line, sign, formula) in enumerate(branch.betas):
+            results = self.expansion(sign, formula)[2]
+            if any(branch.closes(s, f) or (s == 'T' and self.is_bottom(f)) for s, f in results):
+                return branch.betas.pop(i)
+        return branch.betas.pop(0)
+
+    def countermodel(self, branch):
+        # The atoms and, in a first-order branch, the predicates of the branch
+        # (ANITA itself never takes a first-order branch as saturated); the
+        # atoms of the theorem that do not occur in the branch are false, as in
+        # the countermodels of check_proof_result. @ is always false, so it is
+        # not part of a countermodel (a branch with T @ is closed).
+        values = {}
+        for formula, signs in branch.lines.items():
+            if self.is_literal(formula):
+                for sign in signs:
+                    values[formula.toString()] = sign
+        for atom in self.atoms:
+            values.setdefault(atom, 'F')
+        return dict(sorted(values.items()))
+
+def prove(theorem, language='en', max_terms=4, max_lines=5000):
+    return TableauProver(language, max_terms, max_lines).prove(theorem)
@@ -2,23 +2,110 @@ import traceback
 from rply import LexerGenerator
 
 ## File formula.py
-class BinaryFormula():
-    def __init__(self, key = '', left = None, right = None):
-        self.key = key
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other): 
-        if not isinstance(other, BinaryFormula):
-            return NotImplemented
+import functools
+import threading
+import weakref
+
+# Formulas are hash-consed: the constructors return the single shared object of
+# each distinct formula, so equal formulas are identical, == is an identity test
+# and the hash is computed once, when the formula is first built.
+_formulas = weakref.WeakValueDictionary()
+_formulas_lock = threading.Lock()
+
+def intern_formula(cls, **fields):
+    key = (cls,) + tuple(fields.values())
+    with _formulas_lock:
+        formula = _formulas.get(key)
+        if formula is None:
+            formula = object.__new__(cls)
+            for name, value in fields.items():
+                object.__setattr__(formula, name, value)
+            object.__setattr__(formula, '_hash', hash(key))
+            _formulas[key] = formula
+    return formula
+
+def memoized_rendering(render):
+    # Formulas are immutable, so toString/toLatex are computed once per node and
+    # parentheses mode and kept in a slot of the node (e.g. _toLatex_parentheses).
+    slots = ('_' + render.__name__, '_' + render.__name__ + '_parentheses')
+    @functools.wraps(render)
+    def memoized(self, parentheses= False):
+        slot = slots[1] if parentheses else slots[0]
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            string = render(self, parentheses=parentheses)
+            object.__setattr__(self, slot, string)
+            return string
+    return memoized
+
+# Returned by match_substitution when the formulas do not match
+NO_MATCH = object()
+
+def memoized_variables(compute):
+    # The variables of a formula never change either: each set is computed once
+    # per node, as a frozenset, and kept in a slot (e.g. _free_variables).
+    slot = '_' + compute.__name__
+    @functools.wraps(compute)
+    def memoized(self):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            variables = frozenset(compute(self))
+            object.__setattr__(self, slot, variables)
+            return variables
+    return memoized
+
+def memoized_evaluation(compile):
+    # The truth value of a propositional formula under a valuation (a dict from
+    # atoms to 'T'/'F') is computed by a closure, built once per node from those
+    # of its subformulas and kept in the _evaluation slot. First-order formulas
+    # have no closure (None).
+    @functools.wraps(compile)
+    def memoized(self):
+        try:
+            return self._evaluation
+        except AttributeError:
+            evaluation = compile(self)
+            object.__setattr__(self, '_evaluation', evaluation)
+            return evaluation
+    return memoized
 
-        return self.key == other.key and self.left == other.left and self.right == other.right
+class Formula():
+    __slots__ = ('_hash', '_toString', '_toString_parentheses', '_toLatex', '_toLatex_parentheses',
+                 '_all_variables', '_bound_variables', '_free_variables', '_atoms', '_evaluation', '__weakref__')
 
-    def __ne__(self, other): 
-        if not isinstance(other, BinaryFormula):
-            return NotImplemented
+    def __setattr__(self, name, value):
+        raise AttributeError('formulas are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('formulas are immutable')
+
+    def __hash__(self):
+        return self._hash
+
+    def match_substitution(self, var_x, formula, witness):
+        # Matches formula against this formula with var_x replaced by a variable t,
+        # in one pass over both trees. Returns t, or the given witness (None until
+        # some free var_x is matched) if var_x is not free here, or NO_MATCH.
+        if var_x not in self.free_variables():
+            return witness if self is formula else NO_MATCH
+        return self.match_free_substitution(var_x, formula, witness)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class BinaryFormula(Formula):
+    __slots__ = ('key', 'left', 'right')
+
+    def __new__(cls, key = '', left = None, right = None):
+        return intern_formula(BINARY_FORMULAS.get(key, BinaryFormula), key=key, left=left, right=right)
 
-        return self.key != other.key or self.left != other.left or self.right != other.right
+    def __reduce__(self):
+        return (BinaryFormula, (self.key, self.left, self.right))
 
     def create_string_representation(self, formula, parentheses= False):
         if(parentheses):
@@ -43,6 +130,7 @@ class BinaryFormula():
     def is_disjunction(self):
       return self.key=='|'
 
+    @memoized_rendering
     def toLatex(self, parentheses= False):
         operators = {
             '->': '\\rightarrow ',
@@ -57,6 +145,7 @@ class BinaryFormula():
           return '('+string+')'
         return string
 
+    @memoized_rendering
     def toString(self, parentheses= False):
         string = self.create_string_representation(self.left, parentheses=parentheses)
         string += self.key
@@ -65,14 +154,29 @@ class BinaryFormula():
           return '('+string+')'
         return string
 
+    @memoized_variables
     def all_variables(self):
-      return self.left.all_variables().union(self.right.all_variables())
+      return self.left.all_variables() | self.right.all_variables()
 
+    @memoized_variables
     def bound_variables(self):
-      return self.all_variables().difference(self.free_variables())
+      return self.all_variables() - self.free_variables()
 
+    @memoized_variables
     def free_variables(self):
-      return self.left.free_variables().union(self.right.free_variables())
+      return self.left.free_variables() | self.right.free_variables()
+
+    @memoized_variables
+    def atoms(self):
+      return self.left.atoms() | self.right.atoms()
+
+    @memoized_evaluation
+    def evaluation(self):
+      left = self.left.evaluation()
+      right = self.right.evaluation()
+      if left is None or right is None:
+        return None
+      return BINARY_EVALUATIONS[self.key](left, right)
 
     def is_substitutable(self, x, y):
       return self.left.is_substitutable(x,y) and self.right.is_substitutable(x,y) 
@@ -80,6 +184,14 @@ class BinaryFormula():
     def substitution(self, var_x, a):
       return BinaryFormula(self.key, self.left.substitution(var_x, a), self.right.substitution(var_x, a))
 
+    def match_free_substitution(self, var_x, formula, witness):
+      if not (isinstance(formula,BinaryFormula) and self.key==formula.key):
+        return NO_MATCH
+      witness = self.left.match_substitution(var_x, formula.left, witness)
+      if witness is NO_MATCH:
+        return NO_MATCH
+      return self.right.match_substitution(var_x, formula.right, witness)
+
     def get_values_x_substitution(self, var_x, formula):
       if not (isinstance(formula,BinaryFormula) and self.key==formula.key):
         return set()
@@ -90,37 +202,55 @@ class BinaryFormula():
       return self.left.is_first_order_formula() or self.right.is_first_order_formula()
 
 class AndFormula(BinaryFormula):
-    def __init__(self, left = None, right = None):
-        super().__init__(key = '&', left=left, right = right)
+    __slots__ = ()
+
+    def __new__(cls, left = None, right = None):
+        return BinaryFormula.__new__(cls, key = '&', left=left, right = right)
 
 class OrFormula(BinaryFormula):
-    def __init__(self, left = None, right = None):
-        super().__init__(key = '|', left=left, right = right)
+    __slots__ = ()
+
+    def __new__(cls, left = None, right = None):
+        return BinaryFormula.__new__(cls, key = '|', left=left, right = right)
 
 class ImplicationFormula(BinaryFormula):
-    def __init__(self, left = None, right = None):
-        super().__init__(key = '->', left=left, right = right)
+    __slots__ = ()
+
+    def __new__(cls, left = None, right = None):
+        return BinaryFormula.__new__(cls, key = '->', left=left, right = right)
 
 class BiImplicationFormula(BinaryFormula):
-    def __init__(self, left = None, right = None):
-        super().__init__(key = '<->', left=left, right = right)
+    __slots__ = ()
 
-class NegationFormula():
-    def __init__(self, formula = None):
-        self.formula = formula
+    def __new__(cls, left = None, right = None):
+        return BinaryFormula.__new__(cls, key = '<->', left=left, right = right)
 
-    def __eq__(self, other): 
-        if not isinstance(other, NegationFormula):
-            return NotImplemented
+# Class of the binary formulas of each connective
+BINARY_FORMULAS = {
+    '&': AndFormula,
+    '|': OrFormula,
+    '->': ImplicationFormula,
+    '<->': BiImplicationFormula,
+}
 
-        return self.formula == other.formula
+# Closure of the truth value of a binary formula from those of its subformulas
+BINARY_EVALUATIONS = {
+    '&': lambda left, right: lambda v: left(v) and right(v),
+    '|': lambda left, right: lambda v: left(v) or right(v),
+    '->': lambda left, right: lambda v: not left(v) or right(v),
+    '<->': lambda left, right: lambda v: left(v) == right(v),
+}
 
-    def __ne__(self, other): 
-        if not isinstance(other, NegationFormula):
-            return NotImplemented
+class NegationFormula(Formula):
+    __slots__ = ('formula',)
+
+    def __new__(cls, formula = None):
+        return intern_formula(NegationFormula, formula=formula)
 
-        return self.formula != other.formula
+    def __reduce__(self):
+        return (NegationFormula, (self.formula,))
 
+    @memoized_rendering
     def toLatex(self, parentheses= False):
         if(parentheses):
           return '('+'\\lnot ' + self.formula.toLatex(parentheses=parentheses)+')'
@@ -130,6 +260,7 @@ class NegationFormula():
             string = '\\lnot({})'.format(self.formula.toLatex())
         return string   
 
+    @memoized_rendering
     def toString(self, parentheses= False):
         if parentheses:
             string = '(~' + self.formula.toString(parentheses=parentheses)+')'
@@ -139,21 +270,40 @@ class NegationFormula():
             string = '~({})'.format(self.formula.toString())
         return string 
 
+    @memoized_variables
     def all_variables(self):
       return self.formula.all_variables()
 
+    @memoized_variables
     def bound_variables(self):
-      return self.all_variables().difference(self.free_variables())
+      return self.all_variables() - self.free_variables()
 
+    @memoized_variables
     def free_variables(self):
       return self.formula.free_variables()
 
+    @memoized_variables
+    def atoms(self):
+      return self.formula.atoms()
+
+    @memoized_evaluation
+    def evaluation(self):
+      formula = self.formula.evaluation()
+      if formula is None:
+        return None
+      return lambda v: not formula(v)
+
     def is_substitutable(self, x, y):
       return self.formula.is_substitutable(x,y)
 
     def substitution(self, var_x, a):
       return NegationFormula(self.formula.substitution(var_x, a))
 
+    def match_free_substitution(self, var_x, formula, witness):
+      if not isinstance(formula,NegationFormula):
+        return NO_MATCH
+      return self.formula.match_substitution(var_x, formula.formula, witness)
+
     def get_values_x_substitution(self, var_x, formula):
       values = set()
       if not isinstance(formula,NegationFormula):
@@ -165,39 +315,46 @@ class NegationFormula():
       return self.formula.is_first_order_formula()
 
 
-class AthomFormula():
-    def __init__(self, key = None):
-        self.key = key
-
-    def __eq__(self, other): 
-        if not isinstance(other, AthomFormula):
-            return NotImplemented
+class AthomFormula(Formula):
+    __slots__ = ('key',)
 
-        return self.key == other.key
-    
-    def __ne__(self, other): 
-        if not isinstance(other, AthomFormula):
-            return NotImplemented
+    def __new__(cls, key = None):
+        return intern_formula(BottonFormula if key == '@' else AthomFormula, key=key)
 
-        return self.key != other.key
+    def __reduce__(self):
+        return (AthomFormula, (self.key,))
 
+    @memoized_rendering
     def toLatex(self, parentheses= False):
         if(self.key != '@'):
             return self.key  
         else:
             return '\\bot' 
 
+    @memoized_rendering
     def toString(self, parentheses= False):
         return self.key  
 
     def all_variables(self):
-      return set()
+      return frozenset()
 
     def bound_variables(self):
-      return set()
+      return frozenset()
 
     def free_variables(self):
-      return set()
+      return frozenset()
+
+    def atoms(self):
+      if self.key == '@':
+        return frozenset()
+      return frozenset([self.key])
+
+    @memoized_evaluation
+    def evaluation(self):
+      key = self.key
+      if key == '@':
+        return lambda v: False
+      return lambda v: v[key] == 'T'
 
     def is_substitutable(self, x, y):
       return True 
@@ -211,38 +368,48 @@ class AthomFormula():
       return False
 
 class BottonFormula(AthomFormula):
-    def __init__(self):
-      super().__init__(key='@')
+    __slots__ = ()
 
+    def __new__(cls):
+      return AthomFormula.__new__(cls, key='@')
 
-class PredicateFormula():
-    def __init__(self, name = '', variables = []):
-        self.variables = variables
-        self.name = name
 
-    def __eq__(self, other): 
-        if not isinstance(other, PredicateFormula):
-            return NotImplemented
-        return self.variables == other.variables and self.name == other.name
-    
-    def __ne__(self, other): 
-        if not isinstance(other, PredicateFormula):
-            return NotImplemented
+class PredicateFormula(Formula):
+    __slots__ = ('name', 'variables')
 
-        return self.variables != other.variables or self.name != other.name
+    def __new__(cls, name = '', variables = ()):
+        return intern_formula(PredicateFormula, name=name, variables=tuple(variables))
 
+    def __reduce__(self):
+        return (PredicateFormula, (self.name, self.variables))
+
+    @memoized_rendering
     def toLatex(self, parentheses= False):
         if self.variables: 
             return self.name+'('+','.join(self.variables)+')'
         else:
             return self.name
 
+    @memoized_rendering
     def toString(self, parentheses= False):
         if self.variables: 
             return self.name+'('+','.join(self.variables)+')'
         else:
             return self.name
 
+    def match_free_substitution(self, var_x, formula, witness):
+      if not (isinstance(formula, PredicateFormula) and formula.name==self.name and len(formula.variables)==len(self.variables)):
+        return NO_MATCH
+      for v, t in zip(self.variables, formula.variables):
+        if v == var_x:
+          if witness is None:
+            witness = t
+          elif t != witness:
+            return NO_MATCH
+        elif v != t:
+          return NO_MATCH
+      return witness
+
     def get_values_x_substitution(self, var_x, formula):
       values = set()
       if isinstance(formula, PredicateFormula) and formula.name==self.name and len(formula.variables)==len(self.variables):
@@ -251,14 +418,22 @@ class PredicateFormula():
             values.add(formula.variables[i])
       return values
 
+    @memoized_variables
     def all_variables(self):
-      return set(self.variables)
+      return self.variables
 
     def bound_variables(self):
-      return set()
+      return frozenset()
 
+    @memoized_variables
     def free_variables(self):
-      return set(self.variables)
+      return self.variables
+
+    def atoms(self):
+      return frozenset()
+
+    def evaluation(self):
+      return None
 
     def is_substitutable(self, x, y):
       return True
@@ -273,23 +448,14 @@ class PredicateFormula():
     def is_first_order_formula(self):
       return True
 
-class QuantifierFormula():
-    def __init__(self, forAll = True, variable=None, formula=None):
-        self.forAll = forAll
-        self.variable = variable
-        self.formula = formula
-
-    def __eq__(self, other): 
-        if not isinstance(other, QuantifierFormula):
-            return NotImplemented
+class QuantifierFormula(Formula):
+    __slots__ = ('forAll', 'variable', 'formula')
 
-        return self.forAll == other.forAll and self.variable == other.variable and self.formula == other.formula
-    
-    def __ne__(self, other): 
-        if not isinstance(other, QuantifierFormula):
-            return NotImplemented
+    def __new__(cls, forAll = True, variable=None, formula=None):
+        return intern_formula(UniversalFormula if forAll else ExistentialFormula, forAll=bool(forAll), variable=variable, formula=formula)
 
-        return self.forAll != other.forAll or self.variable != other.variable or self.formula != other.formula
+    def __reduce__(self):
+        return (QuantifierFormula, (self.forAll, self.variable, self.formula))
 
     def is_universal(self):
       return self.forAll
@@ -297,6 +463,7 @@ class QuantifierFormula():
     def is_existential(self):
       return not self.forAll
 
+    @memoized_rendering
     def toLatex(self, parentheses= False):
         if parentheses:
           if self.forAll:        
@@ -314,6 +481,7 @@ class QuantifierFormula():
           else:
               return '\\exists {} ({})'.format(self.variable, self.formula.toLatex())
 
+    @memoized_rendering
     def toString(self, parentheses= False):
         if parentheses:
           if self.forAll:        
@@ -331,33 +499,46 @@ class QuantifierFormula():
           else:
               return 'E{} ({})'.format(self.variable, self.formula.toString())
 
+    @memoized_variables
     def all_variables(self):
-      result = self.formula.all_variables()
-      result.add(self.variable)
-      return result
+      return self.formula.all_variables() | {self.variable}
       
+    @memoized_variables
     def bound_variables(self):
-      return self.all_variables().difference(self.free_variables())
+      return self.all_variables() - self.free_variables()
 
+    @memoized_variables
     def free_variables(self):
-      result = self.formula.free_variables()
-      result.discard(self.variable)
-      return result 
+      return self.formula.free_variables() - {self.variable}
+
+    @memoized_variables
+    def atoms(self):
+      return self.formula.atoms()
+
+    def evaluation(self):
+      return None
 
     def is_substitutable(self, x, y):
       if (self.variable == y and x in self.formula.free_variables()):
         return False
       return self.formula.is_substitutable(x,y)# and (self.variable == y or x in self.formula.free_variables())
 
+    # Returns (True, t) if formula is self.formula with the quantified variable
+    # replaced by the free variable t (t is None if the variable does not occur
+    # free in self.formula), and (False, None) otherwise.
+    def substitution_witness(self, formula):
+      witness = self.formula.match_substitution(self.variable, formula, None)
+      if witness is NO_MATCH or (witness is not None and witness not in formula.free_variables()):
+        return False, None
+      return True, witness
+
     def valid_substitution(self, formula):
-      free_vars = formula.free_variables()
-      if len(free_vars)==0:
-         return self.formula==formula
-      for v in free_vars:
-        fAux = self.formula.substitution(self.variable, v)
-        if (fAux==formula):
-          return True
-      return False
+      return self.substitution_witness(formula)[0]
+
+    def match_free_substitution(self, var_x, formula, witness):
+      if not (isinstance(formula,QuantifierFormula) and self.forAll==formula.forAll and self.variable==formula.variable):
+        return NO_MATCH
+      return self.formula.match_substitution(var_x, formula.formula, witness)
 
     def substitution(self, var_x, a):
       if self.variable == var_x:
@@ -376,18 +557,30 @@ class QuantifierFormula():
       return True
 
 class UniversalFormula(QuantifierFormula):
-    def __init__(self, variable=None, formula=None):
-      super().__init__( forAll = True, variable=variable, formula=formula)
+    __slots__ = ()
+
+    def __new__(cls, variable=None, formula=None):
+      return QuantifierFormula.__new__(cls, forAll = True, variable=variable, formula=formula)
 
 class ExistentialFormula(QuantifierFormula):
-    def __init__(self, variable=None, formula=None):
-      super().__init__( forAll = False, variable=variable, formula=formula)
+    __slots__ = ()
+
+    def __new__(cls, variable=None, formula=None):
+      return QuantifierFormula.__new__(cls, forAll = False, variable=variable, formula=formula)
 
 
 ## File lexer.py
+import re
+from rply.errors import LexingError
+from rply.token import SourcePosition, Token
+
 class Lexer():
-    def __init__(self):
+    _lexer = None
+    _lexer_lock = threading.Lock()
+
+    def __init__(self, single_pass=True):
         self.lexer = LexerGenerator()
+        self.single_pass = single_pass
 
     def _add_tokens(self):
         #Comma
@@ -463,224 +656,370 @@ class Lexer():
 
     def get_lexer(self):
         self._add_tokens()
+        if self.single_pass:
+            return SinglePassLexer(self.lexer.rules, self.lexer.ignore_rules)
         return self.lexer.build()
 
+    @classmethod
+    def get_shared_lexer(cls):
+        # The single-pass lexer keeps no state between calls of lex, so one is
+        # compiled per process and shared by every parse, like the parsers.
+        if cls._lexer is None:
+            with cls._lexer_lock:
+                if cls._lexer is None:
+                    cls._lexer = cls().get_lexer()
+        return cls._lexer
+
+class SinglePassLexer():
+    # Same tokens as the rply lexer built from the same rules, but the rules are
+    # compiled into one alternation, so each token costs a single regex match
+    # instead of one attempt per rule. Python's alternation takes the first
+    # alternative that matches, which is rply's priority order (ignore rules
+    # first, then the token rules in the order they were added).
+    def __init__(self, rules, ignore_rules):
+        self.ignored = set()
+        patterns = []
+        for i, rule in enumerate(ignore_rules):
+            name = '_IGNORE{}'.format(i)
+            self.ignored.add(name)
+            patterns.append('(?P<{}>{})'.format(name, rule.re.pattern))
+        for rule in rules:
+            patterns.append('(?P<{}>{})'.format(rule.name, rule.re.pattern))
+        self.regex = re.compile('|'.join(patterns))
+
+    def lex(self, s):
+        match = self.regex.match
+        ignored = self.ignored
+        idx = 0
+        lineno = 1
+        line_start = 0
+        end = len(s)
+        while idx < end:
+            m = match(s, idx)
+            if m is None:
+                raise LexingError(None, SourcePosition(idx, lineno, idx - line_start + 1))
+            name = m.lastgroup
+            start, idx = m.span()
+            if name in ignored:
+                newlines = s.count('\n', start, idx)
+                if newlines:
+                    lineno += newlines
+                    line_start = s.rfind('\n', start, idx) + 1
+                continue
+            yield SourceToken(name, s[start:idx], start, lineno, start - line_start + 1)
+
+class SourceToken():
+    # Same interface as rply's Token, but the source position is kept in three
+    # ints and only turned into a SourcePosition when asked for. The rules keep
+    # their tokens to report errors, so this is most of the memory of a proof.
+    __slots__ = ('name', 'value', 'idx', 'lineno', 'colno')
+
+    def __init__(self, name, value, idx, lineno, colno):
+        self.name = name
+        self.value = value
+        self.idx = idx
+        self.lineno = lineno
+        self.colno = colno
+
+    def __repr__(self):
+        return "Token(%r, %r)" % (self.name, self.value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (SourceToken, Token)):
+            return NotImplemented
+        return self.name == other.name and self.value == other.value
+
+    def gettokentype(self):
+        return self.name
+
+    def getsourcepos(self):
+        return SourcePosition(self.idx, self.lineno, self.colno)
+
+    @property
+    def source_pos(self):
+        return self.getsourcepos()
+
+    def getstr(self):
+        return self.value
+
 
 ## File symbol_table.py
 
+class Branch:
+    # A node of the tableau: the rules written in the branch and direct links to
+    # the parent and children branches.
+    __slots__ = ('id', 'parent', 'children', 'depth', 'rules', 'lines', 'signed', 'contradiction', 'used_variables',
+                 'variable', 'start_line', 'end_line')
+
+    def __init__(self, id, parent=None, start_line='1', variable=None):
+        self.id = id
+        self.parent = parent
+        self.children = []
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.rules = []
+        self.lines = {}
+        # Truth values of the formulas written in this branch. The formulas
+        # visible in a branch are those of its ancestors plus its own, so
+        # sibling branches share the sets of their common prefix.
+        self.signed = {}
+        # Line of the first rule of this branch whose formula already occurs
+        # in the branch with the other truth value.
+        self.contradiction = None
+        # Free variables of the rules written so far in the branch and above it.
+        self.used_variables = parent.used_variables if parent is not None else frozenset()
+        self.variable = variable
+        self.start_line = start_line
+        self.end_line = None
+
+    @property
+    def name(self):
+        return 'branch_{}'.format(self.id)
+
+    def ancestors(self):
+        # The branch itself followed by its parents up to the root.
+        branch = self
+        while branch is not None:
+            yield branch
+            branch = branch.parent
+
+    def contradicts(self, formula, true_value):
+        # Whether the formula is visible in the branch with another truth value.
+        for branch in self.ancestors():
+            for value in branch.signed.get(formula, ()):
+                if value != true_value:
+                    return True
+        return False
+
+    def __repr__(self):
+        return 'Branch({}, parent={}, start_line={}, end_line={}, rules={})'.format(
+            self.name, self.parent.name if self.parent is not None else None,
+            self.start_line, self.end_line, [rule.line for rule in self.rules])
+
 class SymbolTable:
     def __init__(self):
-        self.symbol_table = {
-            'branch_0': {
-                'name': 'branch_0',
-                'parent': None,
-                'children': [],
-                'rules': [],
-                'variable': None,
-                'start_line': '1',
-                'end_line': None
-            }
-        }
-        self.current_branch = 'branch_0'
+        self.root = Branch(0)
+        # Branches in creation order, symbol_table[i].id == i.
+        self.symbol_table = [self.root]
+        self.current_branch = self.root
+        # Branches without children, by id and in creation order.
+        self.leaves = {0: self.root}
+        # Line indexes kept up to date by insert() and add_branch(). When a line
+        # number is repeated, the rule of the first branch (and the first rule in
+        # that branch) wins, as in a scan of the branches in order.
+        self.rule_by_line = {}
+        self.branch_by_line = {}
+        self.branch_by_start_line = {1: self.root}
+        # Free variables of the rules above each line in its branch, for
+        # is_fresh_variable(). Dropped (None) when the lines are out of order or a
+        # branch introduces a variable, in which case the branches are scanned.
+        self.free_variables_before_line = {}
+        self.last_line = 0
 
     def insert(self, rule):
-        self.symbol_table[self.current_branch]['rules'].append(rule)
+        branch = self.current_branch
+        branch.rules.append(rule)
+        branch.lines.setdefault(rule.line, rule)
+        if not isinstance(rule, ClosedRule):
+            if branch.contradiction is None and branch.contradicts(rule.formula, rule.true_value):
+                branch.contradiction = rule.line
+            branch.signed.setdefault(rule.formula, set()).add(rule.true_value)
+        first_branch = self.branch_by_line.get(rule.line)
+        if first_branch is None or branch.id < first_branch.id:
+            self.branch_by_line[rule.line] = branch
+            self.rule_by_line[rule.line] = rule
+        self.track_free_variables(branch, rule)
+
+    def track_free_variables(self, branch, rule):
+        if self.free_variables_before_line is None:
+            return
+        if rule.line <= self.last_line or rule.formula is None:
+            self.free_variables_before_line = None
+            return
+        self.last_line = rule.line
+        self.free_variables_before_line[rule.line] = branch.used_variables
+        variables = rule.formula.free_variables()
+        if not variables <= branch.used_variables:
+            branch.used_variables = branch.used_variables | variables
 
     def start_branch(self, branch):
         self.current_branch = branch
 
     def end_branch(self, end_line):
-        self.symbol_table[self.current_branch]['end_line'] = end_line
-        if(self.symbol_table[self.current_branch]['parent'] is not None):
-            self.current_branch = self.symbol_table[self.current_branch]['parent']
+        self.current_branch.end_line = end_line
+        if(self.current_branch.parent is not None):
+            self.current_branch = self.current_branch.parent
 
     def add_branch(self, start_line, variable=None):
-        branch = 'branch_{}'.format(len(self.symbol_table))
-        self.symbol_table[branch] = {
-            'name': branch,
-            'parent': self.current_branch,
-            'children': [],
-            'rules': [],
-            'variable': variable,
-            'start_line': start_line,
-            'end_line': None 
-            }
-        self.symbol_table[self.current_branch]['children'].append(self.symbol_table[branch])
+        branch = Branch(len(self.symbol_table), self.current_branch, start_line, variable)
+        if variable:
+            self.free_variables_before_line = None
+        self.symbol_table.append(branch)
+        self.branch_by_start_line.setdefault(int(start_line), branch)
+        self.current_branch.children.append(branch)
+        self.leaves.pop(self.current_branch.id, None)
+        self.leaves[branch.id] = branch
         self.start_branch(branch)
 
-    def branch_to_latex(self, branch, rules=[], color='red'):
+    def branch_latex_nodes(self, branch, highlighted, color='red'):
+      # The qtree nodes of the rules of a branch (consecutive alpha rules from
+      # the same reference share a node); highlighted holds the ids of the
+      # rules to color.
       i = 0
       l = []
-      initial_tableau = '[.{'
-      n_rules = len(branch['rules']) 
+      initial_tableau = []
+      n_rules = len(branch.rules)
       while i< n_rules:
-        if isinstance(branch['rules'][i],PremisseRule):
-          if (branch['rules'][i] in rules):
-            initial_tableau += '\color{'+color+'}{$'+branch['rules'][i].toLatex(self)+'$} \\\\ '
+        rule = branch.rules[i]
+        if isinstance(rule,PremisseRule):
+          if (id(rule) in highlighted):
+            initial_tableau.append('\color{'+color+'}{$'+rule.toLatex(self)+'$} \\\\ ')
           else:
-            initial_tableau += '$'+branch['rules'][i].toLatex(self)+'$ \\\\ '
-        elif isinstance(branch['rules'][i],ConclusionRule):
-          if (branch['rules'][i] in rules):
-            initial_tableau += '\color{'+color+'}{$'+branch['rules'][i].toLatex(self)+'$}}'
+            initial_tableau.append('$'+rule.toLatex(self)+'$ \\\\ ')
+        elif isinstance(rule,ConclusionRule):
+          if (id(rule) in highlighted):
+            initial_tableau.append('\color{'+color+'}{$'+rule.toLatex(self)+'$}}')
           else:
-            initial_tableau += '$'+branch['rules'][i].toLatex(self)+'$}'
-          l.append(initial_tableau)
-        elif isinstance(branch['rules'][i],AndTrueRule):
-          if (branch['rules'][i] in rules):
-            s = '[.{{\color{'+color+'}$'+branch['rules'][i].toLatex(self)+'$}'
+            initial_tableau.append('$'+rule.toLatex(self)+'$}')
+          l.append('[.{'+''.join(initial_tableau))
+        elif isinstance(rule,(AndTrueRule,OrFalseRule,ImpFalseRule)):
+          if (id(rule) in highlighted):
+            s = '[.{{\color{'+color+'}$'+rule.toLatex(self)+'$}'
           else:
-            s = '[.{$'+branch['rules'][i].toLatex(self)+'$'
-          if i+1< n_rules and isinstance(branch['rules'][i+1],AndTrueRule) and branch['rules'][i].reference1==branch['rules'][i+1].reference1:            
-            if (branch['rules'][i+1] in rules):
-              s+=' \\\\ {\color{'+color+'}$'+branch['rules'][i+1].toLatex(self)+'$}'
+            s = '[.{$'+rule.toLatex(self)+'$'
+          if i+1< n_rules and isinstance(branch.rules[i+1],type(rule)) and rule.reference1==branch.rules[i+1].reference1:
+            if (id(branch.rules[i+1]) in highlighted):
+              s+=' \\\\ {\color{'+color+'}$'+branch.rules[i+1].toLatex(self)+'$}'
             else:  
-              s+=' \\\\ '+'$'+branch['rules'][i+1].toLatex(self)+'$'
-            i+=1
-          l.append(s+'}')
-        elif isinstance(branch['rules'][i],OrFalseRule):
-          if (branch['rules'][i] in rules):
-            s = '[.{{\color{'+color+'}$'+branch['rules'][i].toLatex(self)+'$}'
-          else:
-            s = '[.{$'+branch['rules'][i].toLatex(self)+'$'
-          if i+1< n_rules and isinstance(branch['rules'][i+1],OrFalseRule) and branch['rules'][i].reference1==branch['rules'][i+1].reference1:            
-            if (branch['rules'][i+1] in rules):
-              s+=' \\\\ {\color{'+color+'}$'+branch['rules'][i+1].toLatex(self)+'$}'
-            else:  
-              s+=' \\\\ '+'$'+branch['rules'][i+1].toLatex(self)+'$'
-            i+=1
-          l.append(s+'}')
-        elif isinstance(branch['rules'][i],ImpFalseRule):
-          if (branch['rules'][i] in rules):
-            s = '[.{{\color{'+color+'}$'+branch['rules'][i].toLatex(self)+'$}'
-          else:
-            s = '[.{$'+branch['rules'][i].toLatex(self)+'$'
-          if i+1< n_rules and isinstance(branch['rules'][i+1],ImpFalseRule) and branch['rules'][i].reference1==branch['rules'][i+1].reference1:            
-            if (branch['rules'][i+1] in rules):
-              s+=' \\\\ {\color{'+color+'}$'+branch['rules'][i+1].toLatex(self)+'$}'
-            else:  
-              s+=' \\\\ '+'$'+branch['rules'][i+1].toLatex(self)+'$'
+              s+=' \\\\ '+'$'+branch.rules[i+1].toLatex(self)+'$'
             i+=1
           l.append(s+'}')
         else:
-          if (branch['rules'][i] in rules):
-            l.append('[.{\color{'+color+'}{$'+branch['rules'][i].toLatex(self)+'$}}') 
-
+          if (id(rule) in highlighted):
+            l.append('[.{\color{'+color+'}{$'+rule.toLatex(self)+'$}}') 
           else:
-            l.append('[.{$'+branch['rules'][i].toLatex(self)+'$}') 
+            l.append('[.{$'+rule.toLatex(self)+'$}') 
         i+=1
-      s = ' '.join(l)
-      for s_children in branch['children']:
-        s+= ' '+self.branch_to_latex(s_children,rules=rules,color=color)
-      s += ''.join([' ]' for r in range(len(l))])
-      return s
+      return l
+
+    def write_latex(self, out, branch, rules=[], color='red'):
+      # Appends the qtree code of the subtree of branch to the list out in one
+      # traversal: the nodes of a branch, then each child, then one ' ]' for
+      # every node of the branch. The stack holds branches still to be
+      # rendered and the strings that follow them.
+      highlighted = set(id(rule) for rule in rules)
+      stack = [branch]
+      while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+          out.append(item)
+          continue
+        l = self.branch_latex_nodes(item, highlighted, color)
+        out.append(' '.join(l))
+        stack.append(' ]'*len(l))
+        for child in reversed(item.children):
+          stack.append(child)
+          stack.append(' ')
+
+    def branch_to_latex(self, branch, rules=[], color='red'):
+      out = []
+      self.write_latex(out, branch, rules, color)
+      return ''.join(out)
     
     def toLatex(self, rules=[], color='red'):
-      return '\Tree '+self.branch_to_latex(self.symbol_table['branch_0'],rules,color)
+      out = ['\Tree ']
+      self.write_latex(out, self.root, rules, color)
+      return ''.join(out)
 
     def toString(self):
-      for i in range(len(self.symbol_table)):
-        print(self.symbol_table['branch_{}'.format(i)])
+      for branch in self.symbol_table:
+        print(branch)
 
     def len_symbol_table(self):
       r = 0
-      for i in range(len(self.symbol_table)):
-        for rule in self.symbol_table['branch_{}'.format(i)]['rules']:
-          r+=1
+      for branch in self.symbol_table:
+        r+= len(branch.rules)
       return r
 
     def find_token(self, line):
-      for i in range(len(self.symbol_table)):
-        for j in range(len(self.symbol_table['branch_{}'.format(i)]['rules'])):
-          if (self.symbol_table['branch_{}'.format(i)]['rules'][j].line==line):
-            return self.symbol_table['branch_{}'.format(i)]['rules'][j].line
+      rule = self.rule_by_line.get(int(line))
+      if rule is not None:
+        return rule.line
       return None
 
     def find_branch(self, line):
-        for key, branch in self.symbol_table.items():
-            for rule in branch['rules']:
-                if rule and (rule.line == line):
-                    return key 
+        line = int(line)
+        branch = self.branch_by_line.get(line)
+        if branch is not None:
+            return branch
         #Verifica se a linha não tem fórmula (introdução do universal)
-        for key, branch in self.symbol_table.items():
-          if(int(branch['start_line'])==int(line)):
-            return key
-        return None
+        return self.branch_by_start_line.get(line)
 
     def lookup_formula_by_line(self, rule_line, line):
     # Returns only if the line is visible
         branch = self.find_branch(rule_line)
+        line = int(line)
         while branch != None:
-            for rule in self.symbol_table[branch]['rules']:
-                if rule.line == line:
-                    return rule.formula
-            branch = self.symbol_table[branch]['parent']
+            rule = branch.lines.get(line)
+            if rule is not None:
+                return rule.formula
+            branch = branch.parent
         return None
 
     def lookup_true_value_by_line(self, rule_line, line):
     # Returns only if the line is visible
         branch = self.find_branch(rule_line)
+        line = int(line)
         while branch != None:
-            for rule in self.symbol_table[branch]['rules']:
-                if rule.line == line:
+            rule = branch.lines.get(line)
+            if rule is not None:
                   if (isinstance(rule,ClosedRule)):
                     return None
                   else:
                     return rule.true_value
-            branch = self.symbol_table[branch]['parent']
+            branch = branch.parent
         return None        
 
     def check_branch_delimiter(self, line1, line2):
-        for key, branch in self.symbol_table.items():
-            if key != 'branch_0':
-                if(branch['start_line'] == line1 and branch['end_line'] == line2):
-                    start_rule = branch['rules'][0].formula if branch['rules'][0] is not None else None
-                    end_rule = branch['rules'][-1].formula if branch['rules'][-1] is not None else None
+        for branch in self.symbol_table[1:]:
+                if(branch.start_line == line1 and branch.end_line == line2):
+                    start_rule = branch.rules[0].formula if branch.rules[0] is not None else None
+                    end_rule = branch.rules[-1].formula if branch.rules[-1] is not None else None
                     return (start_rule, end_rule)
         return None, None
 
     def get_box_start(self):
-        if self.current_branch != 'branch_0':
-            return self.symbol_table[self.current_branch]['start_line']
+        if self.current_branch is not self.root:
+            return self.current_branch.start_line
         return None
 
     def get_box_end(self):
-        if self.current_branch != 'branch_0':
-            return self.symbol_table[self.current_branch]['end_line']
+        if self.current_branch is not self.root:
+            return self.current_branch.end_line
         return None        
 
     def get_box_end(self, line):
         branch = self.find_branch(line)
-        if branch != 'branch_0':
-            return self.symbol_table[branch]['end_line']
+        if branch is not None and branch is not self.root:
+            return branch.end_line
         return None        
 
     def get_last_rule_from_branch(self):
-        if self.symbol_table[self.current_branch]['rules']==[]: return None
-        return self.symbol_table[self.current_branch]['rules'][-1]
+        if self.current_branch.rules==[]: return None
+        return self.current_branch.rules[-1]
 
     def get_rule(self, rule_line):
-      for i in range(len(self.symbol_table)):
-        for j in range(len(self.symbol_table['branch_{}'.format(i)]['rules'])):
-          if (self.symbol_table['branch_{}'.format(i)]['rules'][j].line==rule_line):
-            return self.symbol_table['branch_{}'.format(i)]['rules'][j]
-      return None
+      return self.rule_by_line.get(int(rule_line))
 
     def check_is_visible(self, formula1_line, formula2_line):
       #Find formula1_line branch.
-      if (int(formula1_line) <= int(formula2_line)): return False
-      current_branch = None
-      for i in range(len(self.symbol_table)):
-        for rule in self.symbol_table['branch_{}'.format(i)]['rules']:
-          if rule and (rule.line == formula1_line):
-            current_branch = self.symbol_table['branch_{}'.format(i)]
-            break
-        if current_branch != None: break
+      formula1_line, formula2_line = int(formula1_line), int(formula2_line)
+      if (formula1_line <= formula2_line): return False
+      branch = self.branch_by_line.get(formula1_line)
       #Check if formula2_line in formula1_line branch 
-      while current_branch != None:
-        for rule in current_branch['rules']:
-          if rule and (rule.line == formula2_line):
-            return True
-        current_branch = self.symbol_table[current_branch['parent']] if 'parent' in current_branch else None
+      while branch != None:
+        if formula2_line in branch.lines:
+          return True
+        branch = branch.parent
       return False
 
 
@@ -689,17 +1028,21 @@ class SymbolTable:
       return not variable in self.get_free_variables_before_branch(line)
 
     def get_free_variables_before_branch(self, line):
+      if self.free_variables_before_line is not None:
+        free_variables = self.free_variables_before_line.get(int(line))
+        if free_variables is not None:
+          return free_variables
       free_variables = set()
       #Find formula1_line branch.
       branch = self.find_branch(line)
       while branch != None:
-          for rule in self.symbol_table[branch]['rules']:
+          for rule in branch.rules:
             if (int(rule.line) < int(line)):
               free_variables = free_variables.union(rule.formula.free_variables())
             #Adds the variable for the universal introduction rule, i.e., if the line does not have a formula
-            if (int(self.symbol_table[branch]['start_line'])<int(line) and self.symbol_table[branch]['variable']):
-              free_variables = free_variables.union(set(self.symbol_table[branch]['variable']))
-          branch = self.symbol_table[branch]['parent']
+            if (int(branch.start_line)<int(line) and branch.variable):
+              free_variables = free_variables.union(set(branch.variable))
+          branch = branch.parent
       return free_variables
       
     def get_branch_rules(self, line):
@@ -707,12 +1050,12 @@ class SymbolTable:
       current_branch = self.find_branch(line)
       while current_branch != None:
         aux_rules = []
-        for rule in self.symbol_table[current_branch]['rules']:
+        for rule in current_branch.rules:
           if rule and (int(rule.line) <= int(line)):
             aux_rules.append(rule)
         aux_rules.reverse()        
-        rules =  rules + aux_rules
-        current_branch = self.symbol_table[current_branch]['parent']# if self.symbol_table[current_branch] else None
+        rules.extend(aux_rules)
+        current_branch = current_branch.parent
       return rules
 
     def count_used_rule_in_the_branch(self, rule):
@@ -743,11 +1086,12 @@ class SymbolTable:
             not_used_rules.append(rule)
       return not_used_rules
 
-    def branch_has_contradiction(self, rules):
-      for rule in rules:
-        for rule_aux in rules:
-          if(rule.formula==rule_aux.formula and rule.true_value!=rule_aux.true_value):
-            return True
+    def branch_has_contradiction(self, branch, line=None):
+      # Whether the rules of the branch up to the line contain a formula with both truth values
+      if line is None: line = branch.rules[-1].line
+      for b in branch.ancestors():
+        if b.contradiction is not None and int(b.contradiction) <= int(line):
+          return True
       return False
 
     def branch_is_saturaded(self,rules):
@@ -756,15 +1100,15 @@ class SymbolTable:
     def get_open_tableau_branches(self):
       open = []
       for branch in self.get_last_branch_branchs():
-        if(not isinstance(branch['rules'][-1], ClosedRule)): 
+        if(not isinstance(branch.rules[-1], ClosedRule)): 
           open.append(branch)
       return open
 
     def get_closed_rule_branches(self):
       closed = []
       for branch in self.get_last_branch_branchs():
-        if(isinstance(branch['rules'][-1], ClosedRule)): 
-          closed.append(branch['rules'][-1])
+        if(isinstance(branch.rules[-1], ClosedRule)): 
+          closed.append(branch.rules[-1])
       return closed
 
     def get_reference_closed_rule(self):
@@ -785,7 +1129,7 @@ class SymbolTable:
       nonsaturated_branches = []
       branchs = self.get_open_tableau_branches()
       for branch in branchs:
-        rules = self.get_branch_rules(branch['rules'][-1].line)
+        rules = self.get_branch_rules(branch.rules[-1].line)
         # Test if a first-order branch
         is_first_order = False
         for r in rules:
@@ -794,7 +1138,7 @@ class SymbolTable:
             break
         if is_first_order:
           nonsaturated_branches.append(rules)
-        elif self.branch_is_saturaded(rules) and not self.branch_has_contradiction(rules):
+        elif self.branch_is_saturaded(rules) and not self.branch_has_contradiction(branch):
           saturated_branches.append(rules)
         else:
           nonsaturated_branches.append(rules)
@@ -818,9 +1162,10 @@ class SymbolTable:
       return ''.join(v)
 
     def get_truth_values(self, saturated_branch):
+      # @ is always false, so it is not part of a countermodel.
       v = {}
       for rule in saturated_branch:
-        if(isinstance(rule.formula, AthomFormula)):
+        if(isinstance(rule.formula, AthomFormula) and not isinstance(rule.formula, BottonFormula)):
           v[rule.formula.toString()] = rule.true_value
       return v
 
@@ -830,6 +1175,21 @@ class SymbolTable:
     def counter_example_toString(self, v):
       return ', '.join(['v('+key+')='+v[key] for key in sorted(list(v.keys()))])
 
+    def complete_truth_values(self, v, atoms):
+      # The atoms that do not occur in the branch are false (atoms leaves out @).
+      v = dict(v)
+      for atom in atoms:
+        v.setdefault(atom, 'F')
+      return dict(sorted(v.items()))
+
+    def is_counter_example(self, v, premisses, conclusion):
+      # Whether v makes the premisses true and the conclusion false, or None if
+      # the theorem is not propositional.
+      evaluations = [formula.evaluation() for formula in premisses + [conclusion]]
+      if None in evaluations:
+        return None
+      return all(evaluation(v) for evaluation in evaluations[:-1]) and not evaluations[-1](v)
+
     def get_counter_examples(self):
       counter_examples = []
       saturated_branches, nonsaturated_branches = self.get_open_saturated_branches()
@@ -841,51 +1201,42 @@ class SymbolTable:
       return self.get_open_tableau_branches()==[]
 
     def get_last_branch_branchs(self):
-      result = []
-      for key, branch in self.symbol_table.items():
-        is_last = True
-        for key_aux, branch_aux in self.symbol_table.items():
-          if(branch_aux['parent']==key and branch_aux!=branch):
-            is_last = False
-            break
-        if is_last :
-          result.append(branch)
-      return result
+      return list(self.leaves.values())
 
     def is_valid_initial_tableau(self):
       has_conclusion = False
-      for key, branch in self.symbol_table.items():
-        if (key=='branch_0'):# O Tableau inicial deve ter uma sequência de premissas seguida da conclusão.
-          for rule in branch['rules']:
+      for branch in self.symbol_table:
+        if (branch is self.root):# O Tableau inicial deve ter uma sequência de premissas seguida da conclusão.
+          for rule in branch.rules:
               if(isinstance(rule, PremisseRule)): 
                 if(has_conclusion):
                   return False
               elif(isinstance(rule, ConclusionRule)):
                 has_conclusion = True
         else: # Premissas ou conclusão só podem ocorrer no tableau inicial.
-          for rule in branch['rules']:
+          for rule in branch.rules:
               if(isinstance(rule, PremisseRule) or isinstance(rule, ConclusionRule)): 
                 return False
       return has_conclusion
       
     def getPremisses(self):
       lines = []
-      for i in range(len(self.symbol_table)):
-        for rule in self.symbol_table['branch_{}'.format(i)]['rules']:
+      for branch in self.symbol_table:
+        for rule in branch.rules:
           if(isinstance(rule, PremisseRule) ):
             lines.append(rule.line)
       return lines
 
     def getPremissesFormulas(self):
       formulas = []
-      for i in range(len(self.symbol_table)):
-        for rule in self.symbol_table['branch_{}'.format(i)]['rules']:
+      for branch in self.symbol_table:
+        for rule in branch.rules:
           if(isinstance(rule, PremisseRule) and rule.formula not in formulas):
             formulas.append(rule.formula)
       return formulas
 
     def getConclusionFormula(self):
-      for rule in self.symbol_table['branch_0']['rules']:
+      for rule in self.root.rules:
           if(isinstance(rule, ConclusionRule)):
             return rule.formula
       return None
@@ -903,27 +1254,22 @@ class SymbolTable:
         return (', '.join(premisses)+' \\vdash '+fConclusion.toLatex(parentheses=parentheses))
 
     def is_closed_branchs(self):
-      for key, branch in self.symbol_table.items():
-        if (key=='branch_0'): continue
-        if(branch['end_line']==None): return False
+      for branch in self.symbol_table[1:]:
+        if(branch.end_line==None): return False
       return True
 
     def find_branch_variable(self, line):
         branch = self.find_branch(line)
         if branch != None:
-          return self.symbol_table[branch]['variable']
-        #Verifica se a linha não tem fórmula (introdução do universal)
-        for key, branch in self.symbol_table.items():
-          if(int(branch['start_line'])==int(line)):
-            return branch['variable']          
+          return branch.variable
         return None
 
     def check_branch_is_valid(self, branch):
         current_branch = self.current_branch
         while current_branch != None:
-            if current_branch == branch:
+            if current_branch is branch:
                 return True
-            current_branch = self.symbol_table[current_branch]['parent']
+            current_branch = current_branch.parent
         return False
 
 
@@ -931,18 +1277,96 @@ class SymbolTable:
 import json
 
 class tableau_deduction_return:
+    # Everything but the errors is derived from the symbol table of a proof
+    # without errors, the first time it is read: a caller that only needs
+    # is_closed never renders the LaTeX or looks for countermodels. Without a
+    # symbol table (a proof with errors) the attributes keep their defaults.
     def __init__(self):
-        self.latex = ''
-        self.is_closed = False,
         self.errors = []
-        self.premisses = []
-        self.conclusion = None
-        self.latex_theorem = ''
-        self.theorem = ''
-        self.counter_examples = None
-        self.colored_latex = ''
-        self.saturared_branches = []
-        self.open_branches = []
+        self.symbol_table = None
+
+    @functools.cached_property
+    def latex(self):
+        if self.symbol_table is None: return ''
+        return self.symbol_table.toLatex()
+
+    @functools.cached_property
+    def is_closed(self):
+        if self.symbol_table is None: return False
+        return self.symbol_table.is_closed_tableau()
+
+    @functools.cached_property
+    def premisses(self):
+        if self.symbol_table is None: return []
+        return self.symbol_table.getPremissesFormulas()
+
+    @functools.cached_property
+    def conclusion(self):
+        if self.symbol_table is None: return None
+        return self.symbol_table.getConclusionFormula()
+
+    @functools.cached_property
+    def theorem(self):
+        if self.symbol_table is None: return ''
+        return ParserAnita.toString(self.premisses, self.conclusion)
+
+    @functools.cached_property
+    def latex_theorem(self):
+        if self.symbol_table is None: return ''
+        return ParserAnita.toLatex(self.premisses, self.conclusion)
+
+    @functools.cached_property
+    def open_saturated_branches(self):
+        if self.symbol_table is None: return [], []
+        return self.symbol_table.get_open_saturated_branches()
+
+    @functools.cached_property
+    def saturared_branches(self):
+        return self.open_saturated_branches[0]
+
+    @functools.cached_property
+    def open_branches(self):
+        return self.open_saturated_branches[1]
+
+    @functools.cached_property
+    def truth_values(self):
+        if self.symbol_table is None: return []
+        return [self.symbol_table.get_truth_values(rules) for rules in self.saturared_branches]
+
+    @functools.cached_property
+    def counter_examples(self):
+        if self.symbol_table is None: return None
+        return [self.symbol_table.counter_example_toString(v) for v in self.truth_values]
+
+    @functools.cached_property
+    def verified_counter_examples(self):
+        # The countermodel of each saturated branch, completed with the atoms of
+        # the theorem missing from the branch, and whether it makes the premisses
+        # true and the conclusion false.
+        if self.symbol_table is None or self.conclusion is None: return []
+        atoms = self.conclusion.atoms().union(*[p.atoms() for p in self.premisses])
+        result = []
+        for v in self.truth_values:
+          v = self.symbol_table.complete_truth_values(v, atoms)
+          result.append((v, self.symbol_table.is_counter_example(v, self.premisses, self.conclusion)))
+        return result
+
+    @functools.cached_property
+    def colored_latex(self):
+        if self.symbol_table is None: return ''
+        if(self.saturared_branches!=[]):
+          rules = []
+          for branch in self.saturared_branches:
+            rules.extend(branch)
+          return self.symbol_table.toLatex(rules=rules,color="red")
+        elif(self.open_branches!=[]):
+          rules = []
+          for branch in self.open_branches:
+            rules.extend(branch)
+          return self.symbol_table.toLatex(rules=rules,color="red")
+        else:
+          rules = self.symbol_table.get_reference_closed_rule()
+          return self.symbol_table.toLatex(rules=rules,color="blue")
 
     def add_error(self, error):
         self.errors.append(error)
@@ -1016,11 +1440,13 @@ class constants:
 
 ## File ast.py
 class PremisseRule():
+    __slots__ = ('token_line', 'token_formula', 'token_true_value', 'line', 'formula', 'true_value')
+
     def __init__(self, token_line, token_true_value, token_formula):
         self.token_line = token_line
         self.token_formula = token_formula[0]
         self.token_true_value = token_true_value
-        self.line = token_line.value
+        self.line = int(token_line.value)
         self.formula = token_formula[1]
         self.true_value = token_true_value.value
 
@@ -1034,11 +1460,13 @@ class PremisseRule():
       return '{}. {} {} pre'.format(self.line, self.true_value, self.formula.toString())
 
 class ConclusionRule():
+    __slots__ = ('token_line', 'token_formula', 'token_true_value', 'line', 'formula', 'true_value')
+
     def __init__(self, token_line, token_true_value, token_formula):
       self.token_line = token_line
       self.token_formula = token_formula[0]
       self.token_true_value = token_true_value
-      self.line = token_line.value
+      self.line = int(token_line.value)
       self.formula = token_formula[1]
       self.true_value = token_true_value.value
 
@@ -1052,16 +1480,19 @@ class ConclusionRule():
       return '{}. {} {} conclusao'.format(self.line, self.true_value, self.formula.toString())
 
 class BasicRule():
+    __slots__ = ('token_line', 'token_formula', 'token_true_value', 'token_reference1', 'token_symbol_rule',
+                 'line', 'formula', 'true_value', 'reference1', 'show_token_symbol')
+
     def __init__(self, token_line, token_true_value, token_formula, token_symbol_rule, token_reference1, show_token_symbol=True):
       self.token_line = token_line
       self.token_formula = token_formula[0]
       self.token_true_value = token_true_value
       self.token_reference1 = token_reference1
       self.token_symbol_rule = token_symbol_rule
-      self.line = token_line.value
+      self.line = int(token_line.value)
       self.formula = token_formula[1]
       self.true_value = token_true_value.value
-      self.reference1 = token_reference1.value
+      self.reference1 = int(token_reference1.value)
       self.show_token_symbol = show_token_symbol
       
     def toLatex(self, symbol_table):
@@ -1074,6 +1505,8 @@ class BasicRule():
         return '{}. {} {} {}'.format(self.line, self.true_value, self.formula.toString(), self.reference1)
 
 class AndTrueRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1097,6 +1530,8 @@ class AndTrueRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_CONJUNCTION, self.token_reference1, self))
 
 class AndFalseRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1120,6 +1555,8 @@ class AndFalseRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_CONJUNCTION, self.token_formula, self))
 
 class OrTrueRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1143,6 +1580,8 @@ class OrTrueRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_DISJUNCTION, self.token_formula, self))
 
 class OrFalseRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1166,6 +1605,8 @@ class OrFalseRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_DISJUNCTION, self.token_reference1, self))
 
 class ImpTrueRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1196,6 +1637,8 @@ class ImpTrueRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_RIGHT_IMPLICATION, self.token_true_value, self))
 
 class ImpFalseRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1224,6 +1667,8 @@ class ImpFalseRule(BasicRule):
               deduction_result.add_error(parser.get_error(constants.INVALID_RIGHT_IMPLICATION, self.token_true_value, self))
 
 class NegationRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1248,15 +1693,18 @@ class NegationRule(BasicRule):
 
 
 class ClosedRule():
+    __slots__ = ('token_line', 'token_formula', 'token_reference1', 'token_reference2',
+                 'line', 'formula', 'reference1', 'reference2', 'show_token_symbol')
+
     def __init__(self, token_line, token_formula, token_reference1, token_reference2, show_token_symbol=True):
         self.token_line = token_line
         self.token_formula = token_formula
         self.token_reference1 = token_reference1
         self.token_reference2 = token_reference2
-        self.line = token_line.value
+        self.line = int(token_line.value)
         self.formula = token_formula[1]
-        self.reference1 = token_reference1.value
-        self.reference2 = token_reference2.value
+        self.reference1 = int(token_reference1.value)
+        self.reference2 = int(token_reference2.value)
         self.show_token_symbol = show_token_symbol
 
     def evaluation(self,parser,deduction_result):
@@ -1296,6 +1744,8 @@ class ClosedRule():
 
 
 class ForAllTrueRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1320,6 +1770,8 @@ class ForAllTrueRule(BasicRule):
           deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_UNIVERSAL, self.token_formula, self))
 
 class ExistsFalseRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1344,6 +1796,8 @@ class ExistsFalseRule(BasicRule):
           deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_EXISTENCIAL, self.token_formula, self))
 
 class ForAllFalseRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1363,19 +1817,21 @@ class ForAllFalseRule(BasicRule):
         parser.has_error = True
         deduction_result.add_error(parser.get_error(constants.INVALID_UNIVERSAL_FORMULA, self.token_reference1, self))
 
-      # If the conclusion is a valid substitution of the universal formula (referecence 1)
-      elif(isinstance(formula1, QuantifierFormula) and not formula1.valid_substitution(self.formula)):
+      else:
+        valid, variable = formula1.substitution_witness(self.formula)
+        # If the conclusion is a valid substitution of the universal formula (referecence 1)
+        if not valid:
           parser.has_error = True
           deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_UNIVERSAL, self.token_formula, self))
-      # If the variable is not a fresh variable 
-      elif(isinstance(formula1, QuantifierFormula)):
-        variables = formula1.get_values_x_substitution(formula1.variable, UniversalFormula(formula1.variable, self.formula))
-        if not parser.symbol_table.is_fresh_variable(self.line, list(variables)[0]):
+        # If the variable is not a fresh variable 
+        elif variable is not None and not parser.symbol_table.is_fresh_variable(self.line, variable):
           parser.has_error = True
           deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, self.token_formula,self))
 
 
 class ExistsTrueRule(BasicRule):
+    __slots__ = ()
+
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
       before = parser.check_line_reference_before_rule_error(deduction_result,self)
@@ -1395,14 +1851,14 @@ class ExistsTrueRule(BasicRule):
         parser.has_error = True
         deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENCIAL_FORMULA, self.token_reference1, self))
 
-      # If the conclusion is a valid substitution of the existencial formula (referecence 1)
-      elif(isinstance(formula1, QuantifierFormula) and not formula1.valid_substitution(self.formula)):
+      else:
+        valid, variable = formula1.substitution_witness(self.formula)
+        # If the conclusion is a valid substitution of the existencial formula (referecence 1)
+        if not valid:
           parser.has_error = True
           deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_UNIVERSAL, self.token_formula, self))
-      # If the variable is not a fresh variable 
-      elif(isinstance(formula1, QuantifierFormula)):
-        variables = formula1.get_values_x_substitution(formula1.variable, ExistentialFormula(formula1.variable, self.formula))
-        if not parser.symbol_table.is_fresh_variable(self.line, list(variables)[0]):
+        # If the variable is not a fresh variable 
+        elif variable is not None and not parser.symbol_table.is_fresh_variable(self.line, variable):
           parser.has_error = True
           deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, self.token_formula,self))
 
@@ -1411,80 +1867,115 @@ class ExistsTrueRule(BasicRule):
 
 from rply import ParserGenerator
 from rply import Token
-import sys
+from rply.parsergenerator import AppDirs
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import asyncio
+import collections
+import enum
+import glob
+import itertools
+import multiprocessing
+import os
+import threading
 import re
 import copy
 
-deduction_result = tableau_deduction_return()
-
-def value_error_handle(exctype, value, tb):
-    deduction_result.add_error(str(value))
-    deduction_result.to_json()
+def build_parser(pg):
+    # rply keeps the LALR tables of a ParserGenerator with a cache_id in the user
+    # cache directory, keyed by a hash of the grammar, and regenerates them only
+    # when the productions or the precedence change.
+    try:
+        return pg.build()
+    except OSError:
+        # The cache directory is not writable (e.g. a sandboxed grader).
+        pg.cache_id = None
+        return pg.build()
+    except (ValueError, LookupError, TypeError):
+        # The cached tables are corrupt or truncated (e.g. a write that was cut
+        # short): remove them and build the tables again, which rewrites the cache.
+        remove_parser_cache(pg)
+        try:
+            return pg.build()
+        except (OSError, ValueError, LookupError, TypeError):
+            pg.cache_id = None
+            return pg.build()
+
+def remove_parser_cache(pg):
+    # The cache files of pg, one per version of the grammar rply has seen.
+    cache_dir = AppDirs('rply').user_cache_dir
+    pattern = '{}-{}-*.json'.format(glob.escape(pg.cache_id), pg.VERSION)
+    for cache_file in glob.glob(os.path.join(glob.escape(cache_dir), pattern)):
+        try:
+            os.unlink(cache_file)
+        except OSError:
+            pass
 
-sys.excepthook = value_error_handle
+class ProofError(str):
+    # The message of an error in a proof (as check_proof prints it), with the
+    # line and column it points at when they are known.
+    def __new__(cls, message, line=None, column=None):
+        error = super().__new__(cls, message)
+        error.line = line
+        error.column = column
+        return error
+
+class ProofSyntaxError(ValueError):
+    def __init__(self, message, line=None, column=None):
+        super().__init__(message)
+        self.line = line
+        self.column = column
 
 class ParserAnita():
+    _parser = None
+    _parser_lock = threading.Lock()
+
+    # Everything a check mutates lives on the instance built by getProof, so
+    # concurrent checks in different threads never share a result or a table.
     def __init__(self, state):
         self.state = state
-        self.pg = ParserGenerator(
-            # A list of all token names accepted by the parser.
-            ['NUM', 'DOT', 'COMMA', 'OPEN_PAREN', 'CLOSE_PAREN', 'NOT', 'BOTTOM',
-             'AND', 'OR', 'AND_TRUE', 'AND_FALSE', 'NEG_TRUE', 'NEG_FALSE','OR_FALSE', 'OR_TRUE', 'IMP_FALSE', 'IMP_TRUE', 
-             'PREMISSE', 'ATHOM', 'OPEN_BRACKET', 'CLOSE_BRACKET', 'IMPLIE', 'CONCLUSION', 'CLOSED',
-             'VAR', 'EXT', 'ALL', 'ALL_TRUE', 'EXT_FALSE', 'EXT_TRUE', 'ALL_FALSE', 'TRUE', 'FALSE' ],
-            #The precedence $\lnot,\forall,\exists,\land,\lor,\rightarrow,\leftrightarrow$
-            precedence=[
-                ('right', ['IMPLIE']),
-                ('right', ['OR']),
-                ('right', ['AND']),
-                ('right', ['EXT']),
-                ('right', ['ALL']),
-                ('right', ['NOT']),
-            ]
-        )
         self.symbol_table = SymbolTable()
         self.has_error = False
+        self.deduction_result = tableau_deduction_return()
 
 
     def verify_sequence_lines_error(self, deduction_result):
         productions = self.state.splitlines()
         i = 1
-        for p in productions:
+        for lineno, p in enumerate(productions, 1):
           x = p.split('.')[0]
           if x.isdigit():
             if int(x)!=i: 
               self.has_error = True
-              if(i==1): deduction_result.add_error('{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial e iniciar em 1.\n'.format(p,x,i))
-              else: deduction_result.add_error('{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial.\n'.format(p,x,i))
+              if(i==1): deduction_result.add_error(ProofError('{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial e iniciar em 1.\n'.format(p,x,i), lineno, 1))
+              else: deduction_result.add_error(ProofError('{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial.\n'.format(p,x,i), lineno, 1))
               break
             i+=1
 
     def check_is_closed_branches_by_rule(self,deduction_result):
       if(not self.symbol_table.is_closed_branchs()):
         self.has_error = True
-        for key, branch in self.symbol_table.symbol_table.items():
-          if (key=='branch_0'): continue
-          if(branch['end_line']==None): 
-            begin_rule = branch["rules"][0]
-            begin_token = branch["rules"][0].token_formula
+        for branch in self.symbol_table.symbol_table[1:]:
+          if(branch.end_line==None): 
+            begin_rule = branch.rules[0]
+            begin_token = branch.rules[0].token_formula
             deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED, begin_token, begin_rule))
 
     def check_is_valid_initial_tableau(self,deduction_result):
       if (not self.symbol_table.is_valid_initial_tableau()):
         self.has_error = True
-        begin_rule = self.symbol_table.symbol_table['branch_0']["rules"][0]
-        begin_token = self.symbol_table.symbol_table['branch_0']["rules"][0].token_formula
+        begin_rule = self.symbol_table.root.rules[0]
+        begin_token = self.symbol_table.root.rules[0].token_formula
         deduction_result.add_error(self.get_error(constants.INVALID_INITIAL_TABLEAU, begin_token, begin_rule))
 
     def check_line_reference_before_rule_error(self, deduction_result, rule):
       result = True
       if hasattr(rule, 'reference1'):
-        if(int(rule.reference1) >= int(rule.line)):
+        if(rule.reference1 >= rule.line):
             self.has_error = True
             deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.token_reference1, rule))
             result = False
       if hasattr(rule, 'reference2'):
-        if(int(rule.reference2) >= int(rule.line)):
+        if(rule.reference2 >= rule.line):
             self.has_error = True
             deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.token_reference2, rule))
             result = False
@@ -1505,10 +1996,28 @@ class ParserAnita():
       return result
 
 
-    def parse(self):
-        deduction_result = tableau_deduction_return()
-        @self.pg.production('program : steps')
-        def program(p):
+    @staticmethod
+    def parse():
+        pg = ParserGenerator(
+            # A list of all token names accepted by the parser.
+            ['NUM', 'DOT', 'COMMA', 'OPEN_PAREN', 'CLOSE_PAREN', 'NOT', 'BOTTOM',
+             'AND', 'OR', 'AND_TRUE', 'AND_FALSE', 'NEG_TRUE', 'NEG_FALSE','OR_FALSE', 'OR_TRUE', 'IMP_FALSE', 'IMP_TRUE', 
+             'PREMISSE', 'ATHOM', 'OPEN_BRACKET', 'CLOSE_BRACKET', 'IMPLIE', 'CONCLUSION', 'CLOSED',
+             'VAR', 'EXT', 'ALL', 'ALL_TRUE', 'EXT_FALSE', 'EXT_TRUE', 'ALL_FALSE', 'TRUE', 'FALSE' ],
+            #The precedence $\lnot,\forall,\exists,\land,\lor,\rightarrow,\leftrightarrow$
+            precedence=[
+                ('right', ['IMPLIE']),
+                ('right', ['OR']),
+                ('right', ['AND']),
+                ('right', ['EXT']),
+                ('right', ['ALL']),
+                ('right', ['NOT']),
+            ],
+            cache_id='anita_pt_proof'
+        )
+        @pg.production('program : steps')
+        def program(self, p):
+            deduction_result = self.deduction_result
             self.verify_sequence_lines_error(deduction_result)
             self.check_is_closed_branches_by_rule(deduction_result)
             self.check_is_valid_initial_tableau(deduction_result)
@@ -1516,6 +2025,8 @@ class ParserAnita():
             rule_info = p[0]
             for i in rule_info:
                 rule_line, formula_reference = rule_info[i]
+                # Steps that close a box have no line number
+                if rule_line.gettokentype() != 'NUM': continue
 
                 formula_reference = self.symbol_table.find_token(rule_line.value)
 
@@ -1540,8 +2051,8 @@ class ParserAnita():
                     if formula1==None or not isinstance(formula1, BinaryFormula):
                       continue
                     rule_AndTrue = self.symbol_table.get_rule(rule.reference1)
-                    rule_previous = self.symbol_table.get_rule(str(int(rule.line)-1))
-                    rule_next = self.symbol_table.get_rule(str(int(rule.line)+1))
+                    rule_previous = self.symbol_table.get_rule(rule.line-1)
+                    rule_next = self.symbol_table.get_rule(rule.line+1)
                     if(formula1.left==rule.formula):    
                       if not ( rule_previous!=None and isinstance(rule_previous, AndTrueRule) and formula1.left==rule_previous.formula):                  
                         if( rule_next==None or (not isinstance(rule_next, AndTrueRule)) or formula1.right!=rule_next.formula):
@@ -1559,11 +2070,11 @@ class ParserAnita():
                 elif(isinstance(rule, AndFalseRule)):
                     rule.evaluation(self, deduction_result)
                     branch = self.symbol_table.find_branch(rule.line)
-                    branch_parent = self.symbol_table.symbol_table[branch]['parent']
-                    branchs = self.symbol_table.symbol_table[branch_parent]['children']
-                    last_rule_parent =self.symbol_table.symbol_table[branch_parent]['rules'][-1]
-                    first_branch_rule =branchs[0]['rules'][0]
-                    if(last_rule_parent.line!=str(int(first_branch_rule.line)-1) or len(branchs)!=2):
+                    branch_parent = branch.parent
+                    branchs = branch_parent.children
+                    last_rule_parent =branch_parent.rules[-1]
+                    first_branch_rule =branchs[0].rules[0]
+                    if(last_rule_parent.line!=first_branch_rule.line-1 or len(branchs)!=2):
                         self.has_error = True
                         deduction_result.add_error(self.get_error(constants.INVALID_BETA_RULE, rule.token_line, rule))
                     else:
@@ -1572,12 +2083,12 @@ class ParserAnita():
                         continue
                       rule_AndFalse = self.symbol_table.get_rule(rule.reference1)
                       if(formula1.left==rule.formula):                      
-                        rule_next = branchs[1]['rules'][0]
+                        rule_next = branchs[1].rules[0]
                         if( rule_next==None or (not isinstance(rule_next, AndFalseRule)) or formula1.right!=rule_next.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_FALSE_CONJUNCTION_NEXT, rule.token_line, rule_AndFalse))
                       elif(formula1.right==rule.formula):                      
-                        rule_previous = branchs[0]['rules'][0]
+                        rule_previous = branchs[0].rules[0]
                         if( rule_previous==None or (not isinstance(rule_previous, AndFalseRule)) or formula1.left!=rule_previous.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_FALSE_CONJUNCTION_PREVIOUS, rule.token_line, rule_AndFalse))
@@ -1593,8 +2104,8 @@ class ParserAnita():
                     if formula1==None or not isinstance(formula1, BinaryFormula):
                       continue
                     rule_OrFalse = self.symbol_table.get_rule(rule.reference1)
-                    rule_previous = self.symbol_table.get_rule(str(int(rule.line)-1))
-                    rule_next = self.symbol_table.get_rule(str(int(rule.line)+1))
+                    rule_previous = self.symbol_table.get_rule(rule.line-1)
+                    rule_next = self.symbol_table.get_rule(rule.line+1)
                     if(formula1.left==rule.formula):    
                       if not (rule_previous!=None and isinstance(rule_previous, OrFalseRule) and formula1.left==rule_previous.formula):
                         if( rule_next==None or (not isinstance(rule_next, OrFalseRule)) or formula1.right!=rule_next.formula):
@@ -1612,11 +2123,11 @@ class ParserAnita():
                 elif(isinstance(rule, OrTrueRule)):
                     rule.evaluation(self, deduction_result)
                     branch = self.symbol_table.find_branch(rule.line)
-                    branch_parent = self.symbol_table.symbol_table[branch]['parent']
-                    branchs = self.symbol_table.symbol_table[branch_parent]['children']
-                    last_rule_parent =self.symbol_table.symbol_table[branch_parent]['rules'][-1]
-                    first_branch_rule =branchs[0]['rules'][0]
-                    if(last_rule_parent.line!=str(int(first_branch_rule.line)-1) or len(branchs)!=2):
+                    branch_parent = branch.parent
+                    branchs = branch_parent.children
+                    last_rule_parent =branch_parent.rules[-1]
+                    first_branch_rule =branchs[0].rules[0]
+                    if(last_rule_parent.line!=first_branch_rule.line-1 or len(branchs)!=2):
                         self.has_error = True
                         deduction_result.add_error(self.get_error(constants.INVALID_BETA_RULE, rule.token_line, rule))
                     else:
@@ -1625,12 +2136,12 @@ class ParserAnita():
                         continue
                       rule_OrTrue = self.symbol_table.get_rule(rule.reference1)
                       if(formula1.left==rule.formula):                      
-                        rule_next = branchs[1]['rules'][0]
+                        rule_next = branchs[1].rules[0]
                         if( rule_next==None or (not isinstance(rule_next, OrTrueRule)) or formula1.right!=rule_next.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_TRUE_DISJUNCTION_NEXT, rule.token_line, rule_OrTrue))
                       elif(formula1.right==rule.formula):                      
-                        rule_previous = branchs[0]['rules'][0]
+                        rule_previous = branchs[0].rules[0]
                         if( rule_previous==None or (not isinstance(rule_previous, OrTrueRule)) or formula1.left!=rule_previous.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_TRUE_DISJUNCTION_PREVIOUS, rule.token_line, rule_OrTrue))
@@ -1642,11 +2153,11 @@ class ParserAnita():
                 elif(isinstance(rule, ImpTrueRule)):
                     rule.evaluation(self, deduction_result)
                     branch = self.symbol_table.find_branch(rule.line)
-                    branch_parent = self.symbol_table.symbol_table[branch]['parent']
-                    branchs = self.symbol_table.symbol_table[branch_parent]['children']
-                    last_rule_parent =self.symbol_table.symbol_table[branch_parent]['rules'][-1]
-                    first_branch_rule =branchs[0]['rules'][0]
-                    if(last_rule_parent.line!=str(int(first_branch_rule.line)-1) or len(branchs)!=2):
+                    branch_parent = branch.parent
+                    branchs = branch_parent.children
+                    last_rule_parent =branch_parent.rules[-1]
+                    first_branch_rule =branchs[0].rules[0]
+                    if(last_rule_parent.line!=first_branch_rule.line-1 or len(branchs)!=2):
                         self.has_error = True
                         deduction_result.add_error(self.get_error(constants.INVALID_BETA_RULE, rule.token_line, rule))
                     else:
@@ -1655,12 +2166,12 @@ class ParserAnita():
                         continue
                       rule_ImpTrue = self.symbol_table.get_rule(rule.reference1)
                       if(formula1.left==rule.formula):                      
-                        rule_next = branchs[1]['rules'][0]
+                        rule_next = branchs[1].rules[0]
                         if( rule_next==None or (not isinstance(rule_next, ImpTrueRule)) or formula1.right!=rule_next.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_TRUE_IMPLICATION_NEXT, rule.token_line, rule_ImpTrue))
                       elif(formula1.right==rule.formula):                      
-                        rule_previous = branchs[0]['rules'][0]
+                        rule_previous = branchs[0].rules[0]
                         if( rule_previous==None or (not isinstance(rule_previous, ImpTrueRule)) or formula1.left!=rule_previous.formula):
                           self.has_error = True
                           deduction_result.add_error(self.get_error(constants.INVALID_TRUE_IMPLICATION_PREVIOUS, rule.token_line, rule_ImpTrue))
@@ -1677,12 +2188,12 @@ class ParserAnita():
                       continue
                     rule_ImpFalse = self.symbol_table.get_rule(rule.reference1)
                     if(formula1.left==rule.formula and rule.token_true_value.gettokentype()=='TRUE'):                      
-                      rule_next = self.symbol_table.get_rule(str(int(rule.line)+1))
+                      rule_next = self.symbol_table.get_rule(rule.line+1)
                       if( rule_next==None or (not isinstance(rule_next, ImpFalseRule)) or formula1.right!=rule_next.formula):
                         self.has_error = True
                         deduction_result.add_error(self.get_error(constants.INVALID_FALSE_IMPLICATION_NEXT, rule.token_line, rule_ImpFalse))
                     elif(formula1.right==rule.formula and rule.token_true_value.gettokentype()=='FALSE'):                      
-                      rule_previous = self.symbol_table.get_rule(str(int(rule.line)-1))
+                      rule_previous = self.symbol_table.get_rule(rule.line-1)
                       if( rule_previous==None or (not isinstance(rule_previous, ImpFalseRule)) or formula1.left!=rule_previous.formula):
                         self.has_error = True
                         deduction_result.add_error(self.get_error(constants.INVALID_FALSE_IMPLICATION_PREVIOUS, rule.token_line, rule_ImpFalse))
@@ -1700,32 +2211,14 @@ class ParserAnita():
                     rule.evaluation(self, deduction_result)
 
             if(not self.has_error):
-                deduction_result.latex = self.symbol_table.toLatex()
-                deduction_result.premisses = self.symbol_table.getPremissesFormulas()
-                deduction_result.conclusion = self.symbol_table.getConclusionFormula()
-                deduction_result.theorem = ParserAnita.toString(deduction_result.premisses, deduction_result.conclusion)
-                deduction_result.latex_theorem = ParserAnita.toLatex(deduction_result.premisses, deduction_result.conclusion)
-                deduction_result.counter_examples = self.symbol_table.get_counter_examples_toString()
-                deduction_result.is_closed = self.symbol_table.is_closed_tableau()
-                deduction_result.saturared_branches, deduction_result.open_branches = self.symbol_table.get_open_saturated_branches()
-                if(deduction_result.saturared_branches!=[]):
-                  rules = []
-                  for branch in deduction_result.saturared_branches:
-                    rules = rules+ branch
-                  deduction_result.colored_latex = self.symbol_table.toLatex(rules=rules,color="red")
-                elif(deduction_result.open_branches!=[]):
-                  rules = []
-                  for branch in deduction_result.open_branches:
-                    rules = rules+ branch
-                  deduction_result.colored_latex = self.symbol_table.toLatex(rules=rules,color="red")
-                else:
-                  rules = self.symbol_table.get_reference_closed_rule()
-                  deduction_result.colored_latex = self.symbol_table.toLatex(rules=rules,color="blue")
+                # The LaTeX, the theorem, the countermodels and the open and
+                # saturated branches are derived from the table on demand.
+                deduction_result.symbol_table = self.symbol_table
             return deduction_result
 
-        @self.pg.production('steps : steps step')
-        @self.pg.production('steps : step')
-        def steps(p):
+        @pg.production('steps : steps step')
+        @pg.production('steps : step')
+        def steps(self, p):
             if len(p) == 1:
                 result = p[0]
                 return {result[0].value: result}
@@ -1735,7 +2228,7 @@ class ParserAnita():
                 return p[0]
 
         # Premisse Rule without rule's name
-        # @self.pg.production('step : NUM DOT TRUE formula')
+        # @pg.production('step : NUM DOT TRUE formula')
         # def Premisse_rule(p):
         #   token_line = p[0]
         #   token_true_value = p[2]
@@ -1745,7 +2238,7 @@ class ParserAnita():
         #   return token_line, formula
 
         # # Conclusion Rule without rule's name
-        # @self.pg.production('step : NUM DOT FALSE formula')
+        # @pg.production('step : NUM DOT FALSE formula')
         # def Conclusion_rule(p):
         #     token_line = p[0]
         #     token_true_value = p[2]
@@ -1756,9 +2249,10 @@ class ParserAnita():
         #     return token_line, formula
 
         # Alpha Rules without rule's name
-        @self.pg.production('step : NUM DOT FALSE formula NUM')
-        @self.pg.production('step : NUM DOT TRUE formula NUM')
-        def Rule_alpha(p):
+        @pg.production('step : NUM DOT FALSE formula NUM')
+        @pg.production('step : NUM DOT TRUE formula NUM')
+        def Rule_alpha(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -1852,9 +2346,10 @@ class ParserAnita():
             return token_line, formula
 
         # Beta Rules without rule's name
-        @self.pg.production('step : NUM DOT OPEN_BRACKET TRUE formula NUM')
-        @self.pg.production('step : NUM DOT OPEN_BRACKET FALSE formula NUM')
-        def Rule_beta(p):
+        @pg.production('step : NUM DOT OPEN_BRACKET TRUE formula NUM')
+        @pg.production('step : NUM DOT OPEN_BRACKET FALSE formula NUM')
+        def Rule_beta(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[3]
             token_formula = p[4]
@@ -1951,8 +2446,8 @@ class ParserAnita():
               deduction_result.add_error(self.get_error(constants.RULE_CANNOT_BE_APPLIED, token_reference1, f))              
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT formula NUM COMMA NUM')
-        def Rule_closed_rule(p):
+        @pg.production('step : NUM DOT formula NUM COMMA NUM')
+        def Rule_closed_rule(self, p):
             token_line = p[0]
             token_formula = p[2]
             token_reference1 = p[3]
@@ -1964,9 +2459,10 @@ class ParserAnita():
 
 
 ### Rules with Rule's name
-        @self.pg.production('step : NUM DOT FALSE formula PREMISSE')
-        @self.pg.production('step : NUM DOT TRUE formula PREMISSE')
-        def Premisse(p):
+        @pg.production('step : NUM DOT FALSE formula PREMISSE')
+        @pg.production('step : NUM DOT TRUE formula PREMISSE')
+        def Premisse(self, p):
+          deduction_result = self.deduction_result
           token_line = p[0]
           token_true_value = p[2]
           token_formula = p[3]
@@ -1979,9 +2475,10 @@ class ParserAnita():
           return token_line, formula
 
 
-        @self.pg.production('step : NUM DOT TRUE formula CONCLUSION')
-        @self.pg.production('step : NUM DOT FALSE formula CONCLUSION')
-        def Conclusion(p):
+        @pg.production('step : NUM DOT TRUE formula CONCLUSION')
+        @pg.production('step : NUM DOT FALSE formula CONCLUSION')
+        def Conclusion(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -1994,9 +2491,10 @@ class ParserAnita():
             return token_line, formula
 
 
-        @self.pg.production('step : NUM DOT FALSE formula AND_TRUE NUM')
-        @self.pg.production('step : NUM DOT TRUE formula AND_TRUE NUM')
-        def And_true(p):
+        @pg.production('step : NUM DOT FALSE formula AND_TRUE NUM')
+        @pg.production('step : NUM DOT TRUE formula AND_TRUE NUM')
+        def And_true(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -2012,9 +2510,10 @@ class ParserAnita():
 
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT OPEN_BRACKET TRUE formula AND_FALSE NUM')
-        @self.pg.production('step : NUM DOT OPEN_BRACKET FALSE formula AND_FALSE NUM')
-        def And_false(p):
+        @pg.production('step : NUM DOT OPEN_BRACKET TRUE formula AND_FALSE NUM')
+        @pg.production('step : NUM DOT OPEN_BRACKET FALSE formula AND_FALSE NUM')
+        def And_false(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[3]
             token_formula = p[4]
@@ -2031,9 +2530,10 @@ class ParserAnita():
               deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, andFalse))              
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT OPEN_BRACKET FALSE formula OR_TRUE NUM')
-        @self.pg.production('step : NUM DOT OPEN_BRACKET TRUE formula OR_TRUE NUM')
-        def Or_true(p):
+        @pg.production('step : NUM DOT OPEN_BRACKET FALSE formula OR_TRUE NUM')
+        @pg.production('step : NUM DOT OPEN_BRACKET TRUE formula OR_TRUE NUM')
+        def Or_true(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[3]
             token_formula = p[4]
@@ -2050,8 +2550,9 @@ class ParserAnita():
               deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, OrTrue))              
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT TRUE formula OR_FALSE NUM')
-        def Or_false_wrong(p):
+        @pg.production('step : NUM DOT TRUE formula OR_FALSE NUM')
+        def Or_false_wrong(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -2067,8 +2568,8 @@ class ParserAnita():
               deduction_result.add_error(self.get_error(constants.RULE_MUST_BE_BETA, token_reference1, orFalse))              
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT FALSE formula OR_FALSE NUM')
-        def Or_false(p):
+        @pg.production('step : NUM DOT FALSE formula OR_FALSE NUM')
+        def Or_false(self, p):
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -2081,9 +2582,9 @@ class ParserAnita():
             self.symbol_table.insert(orFalse)
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT OPEN_BRACKET TRUE formula IMP_TRUE NUM')
-        @self.pg.production('step : NUM DOT OPEN_BRACKET FALSE formula IMP_TRUE NUM')
-        def Imp_true(p):
+        @pg.production('step : NUM DOT OPEN_BRACKET TRUE formula IMP_TRUE NUM')
+        @pg.production('step : NUM DOT OPEN_BRACKET FALSE formula IMP_TRUE NUM')
+        def Imp_true(self, p):
             token_line = p[0]
             token_true_value = p[3]
             token_formula = p[4]
@@ -2097,9 +2598,9 @@ class ParserAnita():
             self.symbol_table.insert(ImpTrue)
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT FALSE formula IMP_FALSE NUM')
-        @self.pg.production('step : NUM DOT TRUE formula IMP_FALSE NUM')
-        def Imp_false(p):
+        @pg.production('step : NUM DOT FALSE formula IMP_FALSE NUM')
+        @pg.production('step : NUM DOT TRUE formula IMP_FALSE NUM')
+        def Imp_false(self, p):
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -2113,11 +2614,12 @@ class ParserAnita():
             return token_line, formula
 
         
-        @self.pg.production('step : NUM DOT TRUE formula NEG_TRUE NUM')
-        @self.pg.production('step : NUM DOT FALSE formula NEG_TRUE NUM')
-        @self.pg.production('step : NUM DOT FALSE formula NEG_FALSE NUM')
-        @self.pg.production('step : NUM DOT TRUE formula NEG_FALSE NUM')
-        def Neg(p):
+        @pg.production('step : NUM DOT TRUE formula NEG_TRUE NUM')
+        @pg.production('step : NUM DOT FALSE formula NEG_TRUE NUM')
+        @pg.production('step : NUM DOT FALSE formula NEG_FALSE NUM')
+        @pg.production('step : NUM DOT TRUE formula NEG_FALSE NUM')
+        def Neg(self, p):
+            deduction_result = self.deduction_result
             token_line = p[0]
             token_true_value = p[2]
             token_formula = p[3]
@@ -2133,8 +2635,8 @@ class ParserAnita():
               deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, negation))              
             return token_line, formula
 
-        @self.pg.production('step : NUM DOT formula CLOSED NUM COMMA NUM')
-        def Rule_closed(p):
+        @pg.production('step : NUM DOT formula CLOSED NUM COMMA NUM')
+        def Rule_closed(self, p):
             token_line = p[0]
             token_formula = p[2]
             token_reference1 = p[4]
@@ -2145,8 +2647,9 @@ class ParserAnita():
             return token_line, formula
 
 
-        @self.pg.production('step : CLOSE_BRACKET')
-        def close_box(p):
+        @pg.production('step : CLOSE_BRACKET')
+        def close_box(self, p):
+            deduction_result = self.deduction_result
             token = p[0]
             rule = self.symbol_table.get_last_rule_from_branch()
             if rule==None:
@@ -2161,9 +2664,10 @@ class ParserAnita():
             return token, None
 
 
-        @self.pg.production('step : NUM DOT FALSE formula ALL_TRUE NUM')
-        @self.pg.production('step : NUM DOT TRUE formula ALL_TRUE NUM')
-        def For_ALL_TRUE(p):
+        @pg.production('step : NUM DOT FALSE formula ALL_TRUE NUM')
+        @pg.production('step : NUM DOT TRUE formula ALL_TRUE NUM')
+        def For_ALL_TRUE(self, p):
+          deduction_result = self.deduction_result
           token_line = p[0]
           token_true_value = p[2]
           token_formula = p[3]
@@ -2179,9 +2683,10 @@ class ParserAnita():
             deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, forall))              
           return token_line, formula
 
-        @self.pg.production('step : NUM DOT TRUE formula EXT_FALSE NUM')
-        @self.pg.production('step : NUM DOT FALSE formula EXT_FALSE NUM')
-        def Exists_FALSE(p):
+        @pg.production('step : NUM DOT TRUE formula EXT_FALSE NUM')
+        @pg.production('step : NUM DOT FALSE formula EXT_FALSE NUM')
+        def Exists_FALSE(self, p):
+          deduction_result = self.deduction_result
           token_line = p[0]
           token_true_value = p[2]
           token_formula = p[3]
@@ -2197,9 +2702,10 @@ class ParserAnita():
             deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, exists))              
           return token_line, formula
 
-        @self.pg.production('step : NUM DOT TRUE formula ALL_FALSE NUM')
-        @self.pg.production('step : NUM DOT FALSE formula ALL_FALSE NUM')
-        def For_ALL_FALSE(p):
+        @pg.production('step : NUM DOT TRUE formula ALL_FALSE NUM')
+        @pg.production('step : NUM DOT FALSE formula ALL_FALSE NUM')
+        def For_ALL_FALSE(self, p):
+          deduction_result = self.deduction_result
           token_line = p[0]
           token_true_value = p[2]
           token_formula = p[3]
@@ -2215,9 +2721,10 @@ class ParserAnita():
             deduction_result.add_error(self.get_error(constants.WRONG_TRUE_VALUE, token_true_value, forall))              
           return token_line, formula
 
-        @self.pg.production('step : NUM DOT FALSE formula EXT_TRUE NUM')
-        @self.pg.production('step : NUM DOT TRUE formula EXT_TRUE NUM')
-        def Exists_TRUE(p):
+        @pg.production('step : NUM DOT FALSE formula EXT_TRUE NUM')
+        @pg.production('step : NUM DOT TRUE formula EXT_TRUE NUM')
+        def Exists_TRUE(self, p):
+          deduction_result = self.deduction_result
           token_line = p[0]
           token_true_value = p[2]
           token_formula = p[3]
@@ -2234,16 +2741,16 @@ class ParserAnita():
           return token_line, formula
 
 
-        @self.pg.production('formula : EXT formula')
-        @self.pg.production('formula : ALL formula')
-        @self.pg.production('formula : formula OR formula')
-        @self.pg.production('formula : formula AND formula')
-        @self.pg.production('formula : formula IMPLIE formula')
-        @self.pg.production('formula : NOT formula')
-        @self.pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
-        @self.pg.production('formula : ATHOM')
-        @self.pg.production('formula : BOTTOM')
-        def formula(p):
+        @pg.production('formula : EXT formula')
+        @pg.production('formula : ALL formula')
+        @pg.production('formula : formula OR formula')
+        @pg.production('formula : formula AND formula')
+        @pg.production('formula : formula IMPLIE formula')
+        @pg.production('formula : NOT formula')
+        @pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
+        @pg.production('formula : ATHOM')
+        @pg.production('formula : BOTTOM')
+        def formula(self, p):
             #print(p)
             if len(p) < 3:
                 if p[0].gettokentype() == 'ATHOM':
@@ -2282,9 +2789,9 @@ class ParserAnita():
                 return result1[0], BinaryFormula(key=p[1].value, left=result1[1], right=result2[1])
 
 
-        @self.pg.production('variableslist : VAR')
-        @self.pg.production('variableslist : VAR COMMA variableslist')
-        def variablesList(p):
+        @pg.production('variableslist : VAR')
+        @pg.production('variableslist : VAR COMMA variableslist')
+        def variablesList(self, p):
              if len(p) == 1:
                  return p[0], [p[0].value]
              else:
@@ -2293,15 +2800,16 @@ class ParserAnita():
 
 
 
-        @self.pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
-        def paren_formula(p):
+        @pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
+        def paren_formula(self, p):
             result = p[1]
             return p[0], result[1]
 
-        @self.pg.error
-        def error_handle(token):
+        @pg.error
+        def error_handle(self, token):
             productions = self.state.splitlines()
             error = ''  
+            source_position = None
 
             if(productions == ['']):
                 error = 'Nenhuma demonstração foi recebida, verifique a entrada.'
@@ -2320,7 +2828,10 @@ class ParserAnita():
                     string += ' Símbolo não pertence a linguagem.'
                 error += string
                 
-            raise ValueError("@@"+error)
+            if source_position is None:
+                raise ProofSyntaxError("@@"+error)
+            raise ProofSyntaxError("@@"+error, source_position.lineno, source_position.colno)
+        return pg
 
     def get_error(self, type_error, token_error, rule):
         productions = self.state.splitlines()
@@ -2431,20 +2942,26 @@ class ParserAnita():
             else:
               erro += "^, O valor-verdade deveria ser F para esta regra."
 
-        return erro
+        return ProofError(erro, token_error.getsourcepos().lineno, column_error)
     
-    def get_parser(self):
-        return self.pg.build()
+    @classmethod
+    def get_parser(cls):
+      # The LALR tables are loaded (or built) once per process and shared by every
+      # parse; the per-parse state is the instance passed to parser.parse(state=...).
+      if cls._parser is None:
+        with cls._parser_lock:
+          if cls._parser is None:
+            cls._parser = build_parser(cls.parse())
+      return cls._parser
 
     @staticmethod
     def getProof(input_proof=''):
-      lexer = Lexer().get_lexer()
+      lexer = Lexer.get_shared_lexer()
       tokens = lexer.lex(input_proof)
 
       pg = ParserAnita(state=input_proof)
-      pg.parse()
-      parser = pg.get_parser()
-      result = parser.parse(tokens)
+      parser = ParserAnita.get_parser()
+      result = parser.parse(tokens, state=pg)
       return result
 
 
@@ -2465,85 +2982,363 @@ class ParserAnita():
 
 
 
-def check_proof(input_proof, input_theorem=None, display_theorem=True, display_countermodel=True, display_latex=True):
-  try:
-      result = ParserAnita.getProof(input_proof)
-      r = ''
-      if(result.errors==[]):
-        set_premisses = set()
-        conclusion = None
-        s_theorem = ParserAnita.toString(result.premisses, result.conclusion)
-        set_premisses_result = set([p.toString() for p in result.premisses])
-
-        if input_theorem!=None: 
-          premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
-          if conclusion == None:
-            return f'{input_theorem} não é um teorema válido!'
-          set_premisses = set([p.toString() for p in premisses])
-
-        if(result.is_closed):
-          if(conclusion == None or (conclusion==result.conclusion and set_premisses==set_premisses_result)):
-            r += "A demonstração está correta."
+class ProofStatus(enum.Enum):
+  VALID = 'valid'                      # closed tableau of the requested theorem
+  NOT_VALID = 'not_valid'              # saturated open branches give countermodels
+  INCOMPLETE = 'incomplete'            # open branches that are not saturated
+  WRONG_THEOREM = 'wrong_theorem'      # closed or saturated, but for another theorem
+  INVALID_THEOREM = 'invalid_theorem'  # the requested theorem is not well formed
+  ERROR = 'error'                      # syntax errors or wrongly applied rules
+
+class ProofResult():
+  # The outcome of checking a proof as data: the status, the errors (each one a
+  # ProofError, with its line and column), the countermodels of the saturated
+  # branches as dicts from every atom of the theorem to 'T'/'F' (with whether
+  # each one was verified against the theorem) and the open branches as lists
+  # of line numbers from the root. The LaTeX and the text printed by check_proof
+  # are only rendered when asked for; to_dict()/to_json() leave them out.
+  def __init__(self, input_theorem=None):
+    self.input_theorem = input_theorem
+    self.status = ProofStatus.ERROR
+    self.errors = []
+    self.deduction_result = None
+    self.symbol_table = None
+
+  @property
+  def theorem(self):
+    if self.deduction_result is None or self.errors != []:
+      return None
+    return self.deduction_result.theorem
+
+  @property
+  def countermodels(self):
+    if self.deduction_result is None or self.errors != []:
+      return []
+    return [v for v, verified in self.deduction_result.verified_counter_examples]
+
+  @property
+  def verified_countermodels(self):
+    if self.deduction_result is None or self.errors != []:
+      return []
+    return [verified for v, verified in self.deduction_result.verified_counter_examples]
+
+  @property
+  def open_branches(self):
+    if self.deduction_result is None or self.errors != []:
+      return []
+    return [[rule.line for rule in reversed(rules)] for rules in self.deduction_result.open_branches]
+
+  @property
+  def latex(self):
+    return None if self.deduction_result is None else self.deduction_result.latex
+
+  @property
+  def colored_latex(self):
+    return None if self.deduction_result is None else self.deduction_result.colored_latex
+
+  @property
+  def text(self):
+    return self.to_text()
+
+  def to_text(self, display_theorem=True, display_countermodel=True, display_latex=True):
+    r = ''
+    if self.errors != []:
+      r += "Os seguintes erros foram encontrados:\n"
+      for error in self.errors:
+        r += '\n'+str(error)
+      return r
+    if self.status == ProofStatus.INVALID_THEOREM:
+      return f'{self.input_theorem} não é um teorema válido!'
+    result = self.deduction_result
+    is_requested_theorem = self.status != ProofStatus.WRONG_THEOREM
+    s_theorem = ParserAnita.toString(result.premisses, result.conclusion)
+    if(result.is_closed):
+      if(is_requested_theorem):
+        r += "A demonstração está correta."
+        if display_theorem:
+          r += "\n"+s_theorem
+      else:
+        r += f"Sua demostração de {s_theorem} é válida, mas é diferente da demonstração solicitada {self.input_theorem}"                   
+
+      if display_latex: 
+        r += "\nLatex:\n"+str(result.latex)
+        r += "\nLatex com cor:\n"+str(result.colored_latex)
+    else:
+        if result.saturared_branches != []:
+          if(is_requested_theorem):
+            r += "O Teorema não é válido."
             if display_theorem:
-              r += "\n"+s_theorem
+              r += "\n"+result.theorem 
           else:
-            r += f"Sua demostração de {s_theorem} é válida, mas é diferente da demonstração solicitada {input_theorem}"                   
-
+            r += f"O teorema {s_theorem} não é válido, e é diferente do teorema solicitado {self.input_theorem}"
+          if display_countermodel:
+            r += "\nSão contra-exemplos:"
+            for s_v, (v, verified) in zip(result.counter_examples, result.verified_counter_examples):
+                r += '\n  '+s_v
+                if verified is False:
+                  r += " (não verificado)"
           if display_latex: 
-            r += "\nLatex:\n"+str(result.latex)
-            r += "\nLatex com cor:\n"+str(result.colored_latex)
-        else:
-            if result.saturared_branches != []:
-              if(conclusion==None or (conclusion==result.conclusion and set_premisses==set_premisses_result)):
-                r += "O Teorema não é válido."
-                if display_theorem:
-                  r += "\n"+result.theorem 
-              if display_countermodel:
-                r += "\nSão contra-exemplos:"
-                for s_v in result.counter_examples:
-                    r += '\n  '+s_v
-#                r += "\n"+str(result.latex)
-              if display_latex: 
-                r += "\nLatex:\nO Teorema ${}$ não é válido.\n".format(result.latex_theorem)
-                if display_countermodel:
-                  r += "\nSão contra-exemplos:"
-                  r += "\n\\begin{itemize}"
-                  for s_v in result.counter_examples:
-                      r += '\n  \item $'+s_v+'$'
-                  r += "\n\end{itemize}"
-                r += "\n"+str(result.colored_latex)
-            else: 
-                r += "\nA demonstração do teorema não está completa.\n"
-                if display_theorem:
-                  r += result.theorem
-                r += "\nOs ramos abaixo não estão saturados:"
-                for rules in result.open_branches:
-                  r += "\nRamo:\n  "
-                  r += '\n  '.join([r.toString() for r in reversed(rules)])
-                if display_latex: 
-                  r += "\nLatex:\n"+str(result.latex)
-                  r += "\nLatex com cor:\n"+str(result.colored_latex)
-      else:
-        r += "Os seguintes erros foram encontrados:\n"
-        for error in result.errors:
-          r += '\n'+str(error)
-      return r
-  except ValueError:
-      s = traceback.format_exc()
-      result = (s.split("@@"))[-1]
-      r = "Os seguintes erros foram encontrados:\n\n"
-      r += result
-      return r
+            r += "\nLatex:\nO Teorema ${}$ não é válido.\n".format(result.latex_theorem)
+            if display_countermodel:
+              r += "\nSão contra-exemplos:"
+              r += "\n\\begin{itemize}"
+              for s_v in result.counter_examples:
+                  r += '\n  \item $'+s_v+'$'
+              r += "\n\end{itemize}"
+            r += "\n"+str(result.colored_latex)
+        else: 
+            r += "\nA demonstração do teorema não está completa.\n"
+            if display_theorem:
+              r += result.theorem
+            r += "\nOs ramos abaixo não estão saturados:"
+            for rules in result.open_branches:
+              r += "\nRamo:\n  "
+              r += '\n  '.join([r.toString() for r in reversed(rules)])
+            if display_latex: 
+              r += "\nLatex:\n"+str(result.latex)
+              r += "\nLatex com cor:\n"+str(result.colored_latex)
+    return r
+
+  def to_dict(self):
+    return {
+      'status': self.status.value,
+      'theorem': self.theorem,
+      'input_theorem': self.input_theorem,
+      'errors': [{'line': e.line, 'column': e.column, 'message': str(e)} for e in self.errors],
+      'countermodels': self.countermodels,
+      'verified_countermodels': self.verified_countermodels,
+      'open_branches': self.open_branches,
+    }
+
+  def to_json(self):
+    return json.dumps(self.to_dict(), ensure_ascii=False)
+
+def check_proof_result(input_proof, input_theorem=None):
+  result = ProofResult(input_theorem)
+  parser = ParserAnita.get_parser()
+  try:
+    lexer = Lexer.get_shared_lexer()
+    pg = ParserAnita(state=input_proof)
+    deduction_result = parser.parse(lexer.lex(input_proof), state=pg)
+  except ValueError as e:
+    s = traceback.format_exc()
+    result.errors.append(ProofError((s.split("@@"))[-1], getattr(e, 'line', None), getattr(e, 'column', None)))
+    return result
+  result.deduction_result = deduction_result
+  result.symbol_table = pg.symbol_table
+  if(deduction_result.errors!=[]):
+    result.errors = list(deduction_result.errors)
+    return result
+
+  is_requested_theorem = True
+  if input_theorem!=None: 
+    premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
+    if conclusion == None:
+      result.status = ProofStatus.INVALID_THEOREM
+      return result
+    is_requested_theorem = (conclusion==deduction_result.conclusion and
+                            set([p.toString() for p in premisses])==set([p.toString() for p in deduction_result.premisses]))
+  if(deduction_result.is_closed):
+    result.status = ProofStatus.VALID if is_requested_theorem else ProofStatus.WRONG_THEOREM
+  elif(deduction_result.saturared_branches != []):
+    result.status = ProofStatus.NOT_VALID if is_requested_theorem else ProofStatus.WRONG_THEOREM
   else:
-    pass
+    result.status = ProofStatus.INCOMPLETE
+  return result
+
+def check_proof(input_proof, input_theorem=None, display_theorem=True, display_countermodel=True, display_latex=True):
+  return check_proof_result(input_proof, input_theorem).to_text(display_theorem=display_theorem, display_countermodel=display_countermodel, display_latex=display_latex)
+
+
+def _init_check_proofs_worker():
+  # Runs once in each worker process: the parsers are built (or loaded from
+  # the rply cache) before the first chunk instead of inside it.
+  ParserAnita.get_parser()
+  ParserTheorem.get_parser()
+
+def _check_proof_or_error(proof, theorem, display_theorem, display_countermodel, display_latex, as_dict=False):
+  # A proof whose check raises gets a ProofError with the exception as its
+  # result, so the other proofs of its chunk are still checked.
+  try:
+    result = check_proof_result(proof, theorem)
+    text = result.to_text(display_theorem=display_theorem, display_countermodel=display_countermodel, display_latex=display_latex)
+    if as_dict:
+      return dict(result.to_dict(), text=text)
+    return text
+  except Exception as e:
+    return ProofError('{}: {}'.format(type(e).__name__, e))
+
+def _check_proofs_chunk(chunk, display_theorem, display_countermodel, display_latex, as_dict):
+  return [(i, _check_proof_or_error(proof, theorem, display_theorem, display_countermodel, display_latex, as_dict))
+          for i, proof, theorem in chunk]
+
+def check_proofs(proofs, ordered=True, max_workers=None, chunksize=16, display_theorem=True, display_countermodel=True, display_latex=True, as_dict=False):
+  # Checks an iterable of (proof, theorem) pairs (theorem may be None) with
+  # check_proof in a pool of worker processes, sending them in chunks of
+  # chunksize proofs. With ordered=True the results are yielded in input order;
+  # otherwise (index, result) pairs are yielded as soon as their chunk is done.
+  # At most two chunks per worker are in flight, so proofs may be a generator
+  # over an arbitrarily large batch. The result of a proof whose check raises
+  # is a ProofError with the exception; there is one result per proof. With
+  # as_dict=True the other results are check_proof_result(...).to_dict(), with
+  # the text of check_proof under 'text'.
+  if max_workers is None:
+    max_workers = os.cpu_count() or 1
+  numbered = ((i, proof, theorem) for i, (proof, theorem) in enumerate(proofs))
+  chunks = iter(lambda: list(itertools.islice(numbered, chunksize)), [])
+  pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_check_proofs_worker)
+  try:
+    def submit(chunk):
+      return pool.submit(_check_proofs_chunk, chunk, display_theorem, display_countermodel, display_latex, as_dict)
+    if ordered:
+      pending = collections.deque(submit(chunk) for chunk in itertools.islice(chunks, 2*max_workers))
+      while pending:
+        future = pending.popleft()
+        for chunk in itertools.islice(chunks, 1):
+          pending.append(submit(chunk))
+        for i, result in future.result():
+          yield result
+    else:
+      pending = set(submit(chunk) for chunk in itertools.islice(chunks, 2*max_workers))
+      while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+          for chunk in itertools.islice(chunks, 1):
+            pending.add(submit(chunk))
+          yield from future.result()
+  finally:
+    # Also reached when the caller stops iterating early.
+    pool.shutdown(cancel_futures=True)
+
+def _check_proof_async_worker(conn):
+  # Answers (True, result), or (False, exception) when the check raises, so the
+  # worker survives a proof that makes check_proof fail.
+  _init_check_proofs_worker()
+  while True:
+    try:
+      job = conn.recv()
+    except EOFError:
+      break
+    if job is None:
+      break
+    input_proof, input_theorem, display = job
+    try:
+      answer = (True, check_proof(input_proof, input_theorem=input_theorem, **display))
+    except Exception as e:
+      answer = (False, e)
+    try:
+      conn.send(answer)
+    except Exception as e:
+      # The exception could not be pickled.
+      conn.send((False, RuntimeError('{}: {}'.format(type(answer[1]).__name__, answer[1]))))
+
+class _AsyncWorker():
+  def __init__(self):
+    self.conn, child = multiprocessing.Pipe()
+    self.process = multiprocessing.Process(target=_check_proof_async_worker, args=(child,), daemon=True)
+    self.process.start()
+    child.close()
+
+  def kill(self):
+    # The only way to stop a check that is already running.
+    self.process.kill()
+    self.process.join()
+
+class AsyncProofChecker():
+  # Runs check_proof for asyncio code in up to max_workers worker processes,
+  # each checking one proof at a time. Requests beyond that wait for a worker,
+  # and at most max_pending may wait: further ones fail at once with
+  # asyncio.QueueFull. A check that is cancelled or exceeds its timeout kills
+  # its worker (a new one is started for the next request), so a pathological
+  # proof holds one worker for at most the timeout and never the others.
+  # An instance is meant to be used from a single event loop.
+  _defaults = weakref.WeakKeyDictionary()
+  _default_lock = threading.Lock()
+
+  def __init__(self, max_workers=None, max_pending=64, timeout=None):
+    self.max_workers = max_workers or os.cpu_count() or 1
+    self.max_pending = max_pending
+    self.timeout = timeout
+    self.idle = []
+    self.waiting = 0
+    self.slots = None
+    # Threads that wait for the answers of the workers.
+    self.receivers = ThreadPoolExecutor(max_workers=self.max_workers)
+
+  @classmethod
+  def get_default(cls):
+    # The shared checker of the running event loop: an instance is bound to the
+    # loop it is used from, so each loop (e.g. each asyncio.run) gets its own.
+    loop = asyncio.get_running_loop()
+    with cls._default_lock:
+      # The semaphore of a checker refers to its loop, so the checkers of closed
+      # loops are closed (and their workers stopped) here.
+      for closed in [l for l in cls._defaults if l.is_closed()]:
+        cls._defaults.pop(closed).close()
+      checker = cls._defaults.get(loop)
+      if checker is None:
+        checker = cls._defaults[loop] = AsyncProofChecker()
+    return checker
+
+  async def check(self, input_proof, input_theorem=None, display_theorem=True, display_countermodel=True, display_latex=True, timeout=None):
+    if timeout is None:
+      timeout = self.timeout
+    if self.slots is None:
+      self.slots = asyncio.Semaphore(self.max_workers)
+    if self.slots.locked():
+      if self.waiting >= self.max_pending:
+        raise asyncio.QueueFull('{} proofs are already waiting to be checked.'.format(self.waiting))
+      self.waiting += 1
+      try:
+        await self.slots.acquire()
+      finally:
+        self.waiting -= 1
+    else:
+      await self.slots.acquire()
+    try:
+      worker = self.idle.pop() if self.idle else _AsyncWorker()
+      display = dict(display_theorem=display_theorem, display_countermodel=display_countermodel, display_latex=display_latex)
+      try:
+        worker.conn.send((input_proof, input_theorem, display))
+        receive = asyncio.get_running_loop().run_in_executor(self.receivers, worker.conn.recv)
+        succeeded, result = await asyncio.wait_for(receive, timeout)
+      except BaseException:
+        worker.kill()
+        raise
+      self.idle.append(worker)
+      if not succeeded:
+        raise result
+      return result
+    finally:
+      self.slots.release()
+
+  def close(self):
+    while self.idle:
+      worker = self.idle.pop()
+      worker.conn.send(None)
+      worker.process.join()
+    self.receivers.shutdown()
+
+async def check_proof_async(input_proof, input_theorem=None, display_theorem=True, display_countermodel=True, display_latex=True, timeout=None):
+  # check_proof without blocking the event loop, on the shared AsyncProofChecker
+  # of the running loop; raises TimeoutError when the check takes longer than
+  # timeout seconds, and the exception of check_proof if it raises.
+  checker = AsyncProofChecker.get_default()
+  return await checker.check(input_proof, input_theorem=input_theorem, display_theorem=display_theorem, display_countermodel=display_countermodel, display_latex=display_latex, timeout=timeout)
 
     
 # PARSER DE UM TEOREMA
 
 class ParserTheorem():
+    _parser = None
+    _parser_lock = threading.Lock()
+
     def __init__(self, state):
         self.state = state
-        self.pg = ParserGenerator(
+
+    @staticmethod
+    def parse():
+        pg = ParserGenerator(
             # A list of all token names accepted by the parser.
             ['COMMA', 'OPEN_PAREN', 'CLOSE_PAREN', 'NOT',
              'AND', 'OR',  'BOTTOM','ATHOM', 'IMPLIE', 'IFF',
@@ -2557,29 +3352,28 @@ class ParserTheorem():
                 ('right', ['EXT']),
                 ('right', ['ALL']),
                 ('right', ['NOT']),
-            ]
+            ],
+            cache_id='anita_pt_theorem'
         )
-
-    def parse(self):
-        @self.pg.production('program : formulaslist V_DASH formula')
-        @self.pg.production('program : V_DASH formula')
-        def program(p):
+        @pg.production('program : formulaslist V_DASH formula')
+        @pg.production('program : V_DASH formula')
+        def program(self, p):
             if len(p) == 2:
               return [], p[1][1]
             else:
               return p[0][1], p[2][1]
 
-        @self.pg.production('formula : EXT formula')
-        @self.pg.production('formula : ALL formula')
-        @self.pg.production('formula : formula OR formula')
-        @self.pg.production('formula : formula AND formula')
-        @self.pg.production('formula : formula IMPLIE formula')
-        @self.pg.production('formula : formula IFF formula')
-        @self.pg.production('formula : NOT formula')
-        @self.pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
-        @self.pg.production('formula : ATHOM')
-        @self.pg.production('formula : BOTTOM')
-        def formula(p):
+        @pg.production('formula : EXT formula')
+        @pg.production('formula : ALL formula')
+        @pg.production('formula : formula OR formula')
+        @pg.production('formula : formula AND formula')
+        @pg.production('formula : formula IMPLIE formula')
+        @pg.production('formula : formula IFF formula')
+        @pg.production('formula : NOT formula')
+        @pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
+        @pg.production('formula : ATHOM')
+        @pg.production('formula : BOTTOM')
+        def formula(self, p):
             if len(p) < 3:
                 if p[0].gettokentype() == 'ATHOM':
                     return p[0], AthomFormula(key=p[0].value)
@@ -2618,23 +3412,23 @@ class ParserTheorem():
               else:
                 return result1[0], BinaryFormula(key=p[1].value, left=result1[1], right=result2[1])
 
-        @self.pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
-        def paren_formula(p):
+        @pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
+        def paren_formula(self, p):
             result = p[1]
             return p[0], result[1]
 
-        @self.pg.production('variableslist : VAR')
-        @self.pg.production('variableslist : VAR COMMA variableslist')
-        def variablesList(p):
+        @pg.production('variableslist : VAR')
+        @pg.production('variableslist : VAR COMMA variableslist')
+        def variablesList(self, p):
              if len(p) == 1:
                  return p[0], [p[0].value]
              else:
                 result = p[2]
              return p[0], [p[0].value] + result[1]
 
-        @self.pg.production('formulaslist : formula')
-        @self.pg.production('formulaslist : formula COMMA formulaslist')
-        def formulasList(p):
+        @pg.production('formulaslist : formula')
+        @pg.production('formulaslist : formula COMMA formulaslist')
+        def formulasList(self, p):
              if len(p) == 1:
                  return p[0], [p[0][1]]
              else:
@@ -2642,8 +3436,8 @@ class ParserTheorem():
              return p[0], [p[0][1]] + result[1]
 
 
-        @self.pg.error
-        def error_handle(token):
+        @pg.error
+        def error_handle(self, token):
             productions = self.state.splitlines()
             error = ''  
 
@@ -2665,6 +3459,7 @@ class ParserTheorem():
                 error += string
                 
             raise ValueError("@@"+error)
+        return pg
 
     def get_error(self, type_error, token_error, rule):
         productions = self.state.splitlines()
@@ -2676,18 +3471,22 @@ class ParserTheorem():
         
         return erro
     
-    def get_parser(self):
-        return self.pg.build()
+    @classmethod
+    def get_parser(cls):
+      if cls._parser is None:
+        with cls._parser_lock:
+          if cls._parser is None:
+            cls._parser = build_parser(cls.parse())
+      return cls._parser
     
     @staticmethod
     def getTheorem(input_text=''):
+        parser = ParserTheorem.get_parser()
         try:
-          lexer = Lexer().get_lexer()
+          lexer = Lexer.get_shared_lexer()
           tokens = lexer.lex(input_text)
           pg = ParserTheorem(state=input_text)
-          pg.parse()
-          parser = pg.get_parser()
-          formulas, conclusion = parser.parse(tokens)
+          formulas, conclusion = parser.parse(tokens, state=pg)
           return formulas, conclusion
         except ValueError:
             s = traceback.format_exc()
@@ -2716,9 +3515,15 @@ class ParserTheorem():
 import traceback
 
 class ParserFormula():
+    _parser = None
+    _parser_lock = threading.Lock()
+
     def __init__(self, state):
         self.state = state
-        self.pg = ParserGenerator(
+
+    @staticmethod
+    def parse():
+        pg = ParserGenerator(
             # A list of all token names accepted by the parser.
             ['COMMA', 'OPEN_PAREN', 'CLOSE_PAREN', 'NOT',
              'AND', 'OR',  'BOTTOM','ATHOM', 'IMPLIE', 'IFF',
@@ -2732,26 +3537,25 @@ class ParserFormula():
                 ('right', ['EXT']),
                 ('right', ['ALL']),
                 ('right', ['NOT']),
-            ]
+            ],
+            cache_id='anita_pt_formula'
         )
-
-    def parse(self):
-        @self.pg.production('program : formula')
-        def program(p):
+        @pg.production('program : formula')
+        def program(self, p):
             rule_info = p[0]
             return p[0][1]
 
-        @self.pg.production('formula : EXT formula')
-        @self.pg.production('formula : ALL formula')
-        @self.pg.production('formula : formula OR formula')
-        @self.pg.production('formula : formula AND formula')
-        @self.pg.production('formula : formula IMPLIE formula')
-        @self.pg.production('formula : formula IFF formula')
-        @self.pg.production('formula : NOT formula')
-        @self.pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
-        @self.pg.production('formula : ATHOM')
-        @self.pg.production('formula : BOTTOM')
-        def formula(p):
+        @pg.production('formula : EXT formula')
+        @pg.production('formula : ALL formula')
+        @pg.production('formula : formula OR formula')
+        @pg.production('formula : formula AND formula')
+        @pg.production('formula : formula IMPLIE formula')
+        @pg.production('formula : formula IFF formula')
+        @pg.production('formula : NOT formula')
+        @pg.production('formula : ATHOM OPEN_PAREN variableslist CLOSE_PAREN')
+        @pg.production('formula : ATHOM')
+        @pg.production('formula : BOTTOM')
+        def formula(self, p):
             #print(p)
             if len(p) < 3:
                 if p[0].gettokentype() == 'ATHOM':
@@ -2791,14 +3595,14 @@ class ParserFormula():
               else:
                 return result1[0], BinaryFormula(key=p[1].value, left=result1[1], right=result2[1])
 
-        @self.pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
-        def paren_formula(p):
+        @pg.production('formula : OPEN_PAREN formula CLOSE_PAREN')
+        def paren_formula(self, p):
             result = p[1]
             return p[0], result[1]
 
-        @self.pg.production('variableslist : VAR')
-        @self.pg.production('variableslist : VAR COMMA variableslist')
-        def variablesList(p):
+        @pg.production('variableslist : VAR')
+        @pg.production('variableslist : VAR COMMA variableslist')
+        def variablesList(self, p):
              if len(p) == 1:
                  return p[0], [p[0].value]
              else:
@@ -2806,8 +3610,8 @@ class ParserFormula():
              return p[0], [p[0].value] + result[1]
 
 
-        @self.pg.error
-        def error_handle(token):
+        @pg.error
+        def error_handle(self, token):
             productions = self.state.splitlines()
             error = ''  
 
@@ -2829,6 +3633,7 @@ class ParserFormula():
                 error += string
                 
             raise ValueError("@@"+error)
+        return pg
 
     def get_error(self, type_error, token_error, rule):
         productions = self.state.splitlines()
@@ -2842,18 +3647,22 @@ class ParserFormula():
         
         return erro
     
-    def get_parser(self):
-        return self.pg.build()
+    @classmethod
+    def get_parser(cls):
+      if cls._parser is None:
+        with cls._parser_lock:
+          if cls._parser is None:
+            cls._parser = build_parser(cls.parse())
+      return cls._parser
     @staticmethod
     def getFormula(input_text=''):
         try:
-          lexer = Lexer().get_lexer()
+          lexer = Lexer.get_shared_lexer()
           tokens = lexer.lex(input_text)
 
           pg = ParserFormula(state=input_text)
-          pg.parse()
-          parser = pg.get_parser()
-          result = parser.parse(tokens)
+          parser = ParserFormula.get_parser()
+          result = parser.parse(tokens, state=pg)
           return result
         except ValueError:
             s = traceback.format_exc()
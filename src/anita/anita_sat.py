@@ -0,0 +1,327 @@
+# Decides whether a propositional theorem is valid without building a tableau:
+# the premisses and the negated conclusion are encoded in conjunctive normal
+# form (Tseitin encoding, one variable per compound subformula) and given to a
+# CDCL solver. The theorem is valid when the clauses are unsatisfiable;
+# otherwise the model gives a countermodel, a truth value for every atom of the
+# theorem, written as SymbolTable.counter_example_toString writes them.
+import heapq
+import importlib
+import time
+
+MODULES = {
+    'en': 'anita.anita_en_fo',
+    'pt': 'anita.anita_pt_fo',
+}
+
+def luby(i):
+    # The i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while True:
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+
+class CDCLSolver():
+    # Conflict-driven clause learning: two watched literals per clause, first-UIP
+    # learnt clauses with non-chronological backjumping, variable activities
+    # (VSIDS), phase saving and Luby restarts.
+    # Variables are numbered from 0; the literals of variable v are 2*v (true)
+    # and 2*v+1 (false), so lit^1 is the negation of lit.
+    def __init__(self):
+        self.variables = 0
+        self.value = []          # by literal: True, False or None
+        self.level = []          # by variable
+        self.reason = []         # by variable: the clause that implied it
+        self.activity = []
+        self.phase = []
+        self.watches = []        # by literal: the clauses watching it
+        self.trail = []
+        self.trail_lim = []
+        self.queue_head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.inconsistent = False
+        self.statistics = {'conflicts': 0, 'decisions': 0, 'propagations': 0, 'learnt': 0, 'restarts': 0}
+
+    def new_variable(self):
+        v = self.variables
+        self.variables += 1
+        self.value += [None, None]
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.watches += [[], []]
+        heapq.heappush(self.heap, (0.0, v))
+        return v
+
+    def add_clause(self, literals):
+        # Clauses are added before solve, at level 0.
+        if self.inconsistent:
+            return
+        clause = []
+        for lit in literals:
+            if self.value[lit] is True or lit^1 in clause:
+                return
+            if self.value[lit] is None and lit not in clause:
+                clause.append(lit)
+        if not clause:
+            self.inconsistent = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.inconsistent = True
+        else:
+            self.watch(clause)
+
+    def watch(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, lit, reason):
+        v = lit >> 1
+        self.value[lit] = True
+        self.value[lit^1] = False
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        # Returns a conflicting clause, or None. A clause implying a literal has
+        # it in position 0, which analyze relies on.
+        value = self.value
+        watches = self.watches
+        while self.queue_head < len(self.trail):
+            false_lit = self.trail[self.queue_head]^1
+            self.queue_head += 1
+            self.statistics['propagations'] += 1
+            watching = watches[false_lit]
+            watches[false_lit] = kept = []
+            for i, clause in enumerate(watching):
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value[first] is True:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if value[clause[k]] is not False:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value[first] is False:
+                        kept.extend(watching[i+1:])
+                        self.queue_head = len(self.trail)
+                        return clause
+                    self.assign(first, clause)
+        return None
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-a, u) for u, a in enumerate(self.activity) if self.value[2*u] is None]
+            heapq.heapify(self.heap)
+        elif self.value[2*v] is None:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def analyze(self, conflict):
+        # The first-UIP clause of the conflict (its asserting literal first, a
+        # literal of the backjump level second) and the backjump level.
+        current = len(self.trail_lim)
+        seen = set()
+        learnt = [None]
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        lit = None
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = q >> 1
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == current:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+            while self.trail[index] >> 1 not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            clause = self.reason[lit >> 1]
+            pending -= 1
+            if pending == 0:
+                break
+        learnt[0] = lit^1
+        level = 0
+        if len(learnt) > 1:
+            k = max(range(1, len(learnt)), key=lambda k: self.level[learnt[k] >> 1])
+            learnt[1], learnt[k] = learnt[k], learnt[1]
+            level = self.level[learnt[1] >> 1]
+        self.increment /= 0.95
+        return learnt, level
+
+    def backjump(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = lit >> 1
+            self.phase[v] = not (lit & 1)
+            self.value[lit] = self.value[lit^1] = None
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.queue_head = len(self.trail)
+
+    def decide(self):
+        while self.heap:
+            activity, v = heapq.heappop(self.heap)
+            if self.value[2*v] is None and -activity == self.activity[v]:
+                return 2*v if self.phase[v] else 2*v + 1
+        for v in range(self.variables):
+            if self.value[2*v] is None:
+                return 2*v if self.phase[v] else 2*v + 1
+        return None
+
+    def solve(self):
+        # A model (a truth value for each variable), or None if the clauses are
+        # unsatisfiable.
+        if self.inconsistent or self.propagate() is not None:
+            self.inconsistent = True
+            return None
+        restarts = 1
+        limit = 100 * luby(restarts)
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.statistics['conflicts'] += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.inconsistent = True
+                    return None
+                learnt, level = self.analyze(conflict)
+                self.backjump(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watch(learnt)
+                    self.statistics['learnt'] += 1
+                    self.assign(learnt[0], learnt)
+            elif conflicts >= limit:
+                self.statistics['restarts'] += 1
+                restarts += 1
+                limit = 100 * luby(restarts)
+                conflicts = 0
+                self.backjump(0)
+            else:
+                lit = self.decide()
+                if lit is None:
+                    return [self.value[2*v] for v in range(self.variables)]
+                self.statistics['decisions'] += 1
+                self.trail_lim.append(len(self.trail))
+                self.assign(lit, None)
+
+class TseitinEncoder():
+    # Gives each atom and each compound subformula (formulas are interned, so
+    # equal subformulas share one) a variable of the solver, with the clauses
+    # that make it equivalent to the subformula. Negations are literals.
+    def __init__(self, module, solver):
+        self.module = module
+        self.solver = solver
+        self.literals = {}
+        self.atoms = {}
+
+    def literal(self, formula):
+        lit = self.literals.get(formula)
+        if lit is not None:
+            return lit
+        m = self.module
+        solver = self.solver
+        if isinstance(formula, m.NegationFormula):
+            return self.literal(formula.formula)^1
+        if isinstance(formula, m.BinaryFormula):
+            a = self.literal(formula.left)
+            b = self.literal(formula.right)
+            x = 2*solver.new_variable()
+            if isinstance(formula, m.AndFormula):
+                clauses = [[x^1, a], [x^1, b], [x, a^1, b^1]]
+            elif isinstance(formula, m.OrFormula):
+                clauses = [[x^1, a, b], [x, a^1], [x, b^1]]
+            elif isinstance(formula, m.ImplicationFormula):
+                clauses = [[x^1, a^1, b], [x, a], [x, b^1]]
+            else:
+                clauses = [[x^1, a^1, b], [x^1, a, b^1], [x, a, b], [x, a^1, b^1]]
+            for clause in clauses:
+                solver.add_clause(clause)
+        else:
+            x = 2*solver.new_variable()
+            if isinstance(formula, m.BottonFormula):
+                solver.add_clause([x^1])
+            else:
+                self.atoms[formula.toString()] = x
+        self.literals[formula] = x
+        return x
+
+class ValidityResult():
+    def __init__(self, theorem, valid, countermodel=None, message=None, statistics=None):
+        self.theorem = theorem
+        self.valid = valid                # None when the theorem is not supported
+        self.countermodel = countermodel
+        self.message = message
+        self.statistics = statistics or {}
+
+    def countermodel_toString(self):
+        if self.countermodel is None:
+            return None
+        v = self.countermodel
+        return ', '.join(['v('+key+')='+v[key] for key in sorted(list(v.keys()))])
+
+    def to_dict(self):
+        return {
+            'theorem': self.theorem,
+            'valid': self.valid,
+            'countermodel': self.countermodel,
+            'message': self.message,
+            'statistics': self.statistics,
+        }
+
+def is_propositional(module, formula):
+    if isinstance(formula, module.NegationFormula):
+        return is_propositional(module, formula.formula)
+    if isinstance(formula, module.BinaryFormula):
+        return is_propositional(module, formula.left) and is_propositional(module, formula.right)
+    return not isinstance(formula, (module.PredicateFormula, module.QuantifierFormula))
+
+def check_validity(theorem, language='en'):
+    start = time.perf_counter()
+    module = importlib.import_module(MODULES[language])
+    premisses, conclusion = module.ParserTheorem.getTheorem(theorem)
+    if conclusion is None:
+        return ValidityResult(theorem, None, message='{} is not a valid theorem.'.format(theorem))
+    if not all(is_propositional(module, formula) for formula in premisses + [conclusion]):
+        return ValidityResult(theorem, None, message='The theorem is not propositional.')
+    solver = CDCLSolver()
+    encoder = TseitinEncoder(module, solver)
+    for formula in premisses:
+        solver.add_clause([encoder.literal(formula)])
+    solver.add_clause([encoder.literal(conclusion)^1])
+    statistics = {'variables': solver.variables, 'atoms': len(encoder.atoms)}
+    model = solver.solve()
+    statistics.update(solver.statistics)
+    statistics['seconds'] = time.perf_counter() - start
+    if model is None:
+        return ValidityResult(theorem, True, statistics=statistics)
+    countermodel = {atom: 'T' if model[x >> 1] else 'F' for atom, x in encoder.atoms.items()}
+    return ValidityResult(theorem, False, countermodel=dict(sorted(countermodel.items())), statistics=statistics)
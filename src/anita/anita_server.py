@@ -0,0 +1,148 @@
+# A long-running checker: the modules and parsers of both languages are loaded
+# once, and each request is answered with the text check_proof would return.
+# Requests are JSON objects with the fields proof, theorem, language ('pt' or
+# 'en') and the display options of check_proof (display_theorem,
+# display_countermodel, display_latex); the response is {"result": text} or
+# {"error": message}. Over a Unix domain socket each request and each response
+# is one line; over HTTP the request is the body of a POST to any path.
+# The checker modules are imported by the server only, so "anita client"
+# starts as fast as the interpreter does.
+import http.client
+import importlib
+import json
+import os
+import socket
+import socketserver
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MODULES = {
+    'en': 'anita.anita_en_fo',
+    'pt': 'anita.anita_pt_fo',
+}
+DISPLAY_OPTIONS = ('display_theorem', 'display_countermodel', 'display_latex')
+
+def warm_up():
+    for name in MODULES.values():
+        module = importlib.import_module(name)
+        module.ParserAnita.get_parser()
+        module.ParserTheorem.get_parser()
+
+def check(request):
+    if not isinstance(request, dict):
+        raise ValueError('The request must be a JSON object.')
+    language = request.get('language', 'pt')
+    if language not in MODULES:
+        raise ValueError('The language must be pt or en.')
+    proof = request.get('proof')
+    theorem = request.get('theorem')
+    if not isinstance(proof, str) or not (theorem is None or isinstance(theorem, str)):
+        raise ValueError('The proof and the theorem must be strings.')
+    options = {name: bool(request.get(name, True)) for name in DISPLAY_OPTIONS}
+    check_proof = importlib.import_module(MODULES[language]).check_proof
+    return check_proof(proof, input_theorem=theorem, **options)
+
+class Checker():
+    # Checks in the server process itself, or in a pool of warm worker
+    # processes when workers > 1 (the server threads only wait for them).
+    def __init__(self, workers=1):
+        self.pool = None
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+        else:
+            warm_up()
+
+    def respond(self, request):
+        try:
+            if self.pool is None:
+                return {'result': check(request)}
+            return {'result': self.pool.submit(check, request).result()}
+        except ValueError as e:
+            return {'error': str(e)}
+        except Exception as e:
+            # A proof that makes the checker fail still gets an answer.
+            return {'error': '{}: {}'.format(type(e).__name__, e)}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+def decode_request(data):
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+class UnixRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.checker.respond(decode_request(line))
+            self.wfile.write((json.dumps(response, ensure_ascii=False)+'\n').encode('utf8'))
+            self.wfile.flush()
+
+class HTTPRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        response = self.server.checker.respond(decode_request(self.rfile.read(length)))
+        body = json.dumps(response, ensure_ascii=False).encode('utf8')
+        self.send_response(400 if 'error' in response else 200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def serve(checker, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    if socket_path is not None:
+        # A socket left by a server that did not stop cleanly is replaced; any
+        # other file at socket_path is left alone.
+        if is_socket(socket_path):
+            os.unlink(socket_path)
+        elif os.path.lexists(socket_path):
+            raise FileExistsError('{} exists and is not a socket.'.format(socket_path))
+        server = UnixServer(socket_path, UnixRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), HTTPRequestHandler)
+    server.checker = checker
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        checker.close()
+        if socket_path is not None and is_socket(socket_path):
+            os.unlink(socket_path)
+
+def decode_response(data):
+    if not data.strip():
+        raise ConnectionError('The server closed the connection without an answer.')
+    return json.loads(data)
+
+def send(request, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    # Raises OSError (ConnectionError when there is no answer) if the server
+    # cannot be reached.
+    data = json.dumps(request, ensure_ascii=False).encode('utf8')
+    if socket_path is not None:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+            s.sendall(data+b'\n')
+            with s.makefile('rb') as f:
+                return decode_response(f.readline())
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request('POST', '/', body=data, headers={'Content-Type': 'application/json'})
+        return decode_response(connection.getresponse().read())
+    finally:
+        connection.close()
@@ -0,0 +1,200 @@
+# Truth tables of propositional theorems, all rows at once: a row is a bit of a
+# Python integer (row r gives the i-th atom, in alphabetical order, the value
+# of bit i of r), so each connective is one operation on integers of 2**n bits.
+# The premisses and the conclusion are compiled to a flat list of instructions,
+# with one register per distinct subformula; a register is dropped after its
+# last use, which keeps the memory to a few integers of 2**n bits.
+import importlib
+import time
+
+from anita.anita_sat import is_propositional
+
+MODULES = {
+    'en': 'anita.anita_en_fo',
+    'pt': 'anita.anita_pt_fo',
+}
+MAX_ATOMS = 25
+
+NOT, AND, OR, IMPLIES, IFF, FALSE = range(6)
+
+def atom_mask(i, rows):
+    # The rows (bits) where the i-th atom is true: bit i of the row number is set.
+    if rows < 8 or i < 3:
+        if rows < 8:
+            return sum(1 << r for r in range(rows) if r >> i & 1)
+        pattern = bytes([(0xAA, 0xCC, 0xF0)[i]])
+    else:
+        half = 1 << (i - 3)
+        pattern = bytes(half) + b'\xff'*half
+    return int.from_bytes(pattern * (rows // (8*len(pattern))), 'little')
+
+class Program():
+    # Registers 0..len(atoms)-1 hold the atoms; instruction k is
+    # (operation, a, b, drop) and writes register len(atoms)+k from registers a
+    # and b (b is None for NOT and both for FALSE), then drops the registers in
+    # drop. outputs are the registers of the compiled formulas.
+    def __init__(self, module, formulas):
+        self.module = module
+        self.atoms = sorted({atom for formula in formulas for atom in self.atoms_of(formula)})
+        self.registers = {}
+        self.instructions = []
+        for i, atom in enumerate(self.atoms):
+            self.registers[atom] = i
+        self.outputs = [self.compile(formula) for formula in formulas]
+        self.drop_registers()
+
+    def atoms_of(self, formula):
+        m = self.module
+        if isinstance(formula, m.NegationFormula):
+            return self.atoms_of(formula.formula)
+        if isinstance(formula, m.BinaryFormula):
+            return self.atoms_of(formula.left) | self.atoms_of(formula.right)
+        if isinstance(formula, m.BottonFormula):
+            return set()
+        return {formula.toString()}
+
+    def compile(self, formula):
+        m = self.module
+        key = formula.toString() if self.is_atom(formula) else formula
+        register = self.registers.get(key)
+        if register is not None:
+            return register
+        if isinstance(formula, m.NegationFormula):
+            instruction = (NOT, self.compile(formula.formula), None)
+        elif isinstance(formula, m.BinaryFormula):
+            if isinstance(formula, m.AndFormula):
+                operation = AND
+            elif isinstance(formula, m.OrFormula):
+                operation = OR
+            elif isinstance(formula, m.ImplicationFormula):
+                operation = IMPLIES
+            else:
+                operation = IFF
+            instruction = (operation, self.compile(formula.left), self.compile(formula.right))
+        else:
+            instruction = (FALSE, None, None)
+        register = len(self.atoms) + len(self.instructions)
+        self.instructions.append(instruction)
+        self.registers[key] = register
+        return register
+
+    def is_atom(self, formula):
+        m = self.module
+        return not isinstance(formula, (m.NegationFormula, m.BinaryFormula, m.BottonFormula))
+
+    def drop_registers(self):
+        last_use = {}
+        for k, (operation, a, b) in enumerate(self.instructions):
+            for register in (a, b):
+                if register is not None:
+                    last_use[register] = k
+        for register in self.outputs:
+            last_use.pop(register, None)
+        drop = [[] for _ in self.instructions]
+        for register, k in last_use.items():
+            drop[k].append(register)
+        self.instructions = [(operation, a, b, tuple(d)) for (operation, a, b), d in zip(self.instructions, drop)]
+
+    def run(self):
+        # The truth table of each output, as an integer with one bit per row.
+        rows = 1 << len(self.atoms)
+        full = (1 << rows) - 1
+        registers = [atom_mask(i, rows) for i in range(len(self.atoms))]
+        for operation, a, b, drop in self.instructions:
+            if operation == NOT:
+                value = full ^ registers[a]
+            elif operation == AND:
+                value = registers[a] & registers[b]
+            elif operation == OR:
+                value = registers[a] | registers[b]
+            elif operation == IMPLIES:
+                value = (full ^ registers[a]) | registers[b]
+            elif operation == IFF:
+                value = full ^ (registers[a] ^ registers[b])
+            else:
+                value = 0
+            registers.append(value)
+            for register in drop:
+                registers[register] = None
+        return [registers[register] for register in self.outputs]
+
+def rows_of(mask):
+    # The rows set in the mask, in increasing order.
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for i, byte in enumerate(data):
+        if byte:
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield 8*i + bit
+
+class TruthTableResult():
+    # For the valuations of the atoms of a theorem: the rows where the premisses
+    # and the conclusion are true (models) and those where the premisses are
+    # true and the conclusion is false (countermodels). The theorem is valid
+    # when there are no countermodels, and satisfiable when there are models.
+    def __init__(self, theorem, atoms=None, models=0, countermodels=0, message=None, statistics=None):
+        self.theorem = theorem
+        self.atoms = atoms or []
+        self.models = models
+        self.countermodel_rows = countermodels
+        self.message = message
+        self.statistics = statistics or {}
+
+    @property
+    def valid(self):
+        return None if self.message else self.countermodel_rows == 0
+
+    @property
+    def satisfiable(self):
+        return None if self.message else self.models != 0
+
+    def valuation(self, row):
+        return {atom: 'T' if row >> i & 1 else 'F' for i, atom in enumerate(self.atoms)}
+
+    def countermodels(self):
+        for row in rows_of(self.countermodel_rows):
+            yield self.valuation(row)
+
+    def count_countermodels(self):
+        return bin(self.countermodel_rows).count('1')
+
+    def to_dict(self, max_countermodels=1000):
+        countermodels = []
+        for v in self.countermodels():
+            if len(countermodels) == max_countermodels:
+                break
+            countermodels.append(v)
+        return {
+            'theorem': self.theorem,
+            'valid': self.valid,
+            'satisfiable': self.satisfiable,
+            'atoms': self.atoms,
+            'countermodels': countermodels,
+            'count_countermodels': self.count_countermodels(),
+            'message': self.message,
+            'statistics': self.statistics,
+        }
+
+def truth_table(theorem, language='en', max_atoms=MAX_ATOMS):
+    start = time.perf_counter()
+    module = importlib.import_module(MODULES[language])
+    premisses, conclusion = module.ParserTheorem.getTheorem(theorem)
+    if conclusion is None:
+        return TruthTableResult(theorem, message='{} is not a valid theorem.'.format(theorem))
+    formulas = premisses + [conclusion]
+    if not all(is_propositional(module, formula) for formula in formulas):
+        return TruthTableResult(theorem, message='The theorem is not propositional.')
+    program = Program(module, formulas)
+    if len(program.atoms) > max_atoms:
+        return TruthTableResult(theorem, atoms=program.atoms, message='The theorem has more than {} atoms.'.format(max_atoms))
+    outputs = program.run()
+    rows = 1 << len(program.atoms)
+    premisses_true = (1 << rows) - 1
+    for mask in outputs[:-1]:
+        premisses_true &= mask
+    statistics = {
+        'atoms': len(program.atoms),
+        'instructions': len(program.instructions),
+        'seconds': time.perf_counter() - start,
+    }
+    return TruthTableResult(theorem, program.atoms, premisses_true & outputs[-1], premisses_true & ~outputs[-1], statistics=statistics)